@@ -1,33 +1,76 @@
 import logging
 logger = logging.getLogger(__name__)
 
-from fastapi import APIRouter
+import os
+import json
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from app.services.search_service import SearchService
+from app.services.metrics import timed
 
 router = APIRouter()
 search_service = SearchService()
 
+async def _with_timeout(awaitable):
+    # SearchService enforces per-call timeouts; surface them as a gateway timeout instead of a 500
+    try:
+        return await awaitable
+    except asyncio.TimeoutError:
+        logger.warning("Upstream call timed out")
+        raise HTTPException(status_code=504, detail="Upstream call timed out")
+
+def _summary(r):
+    return {
+        "id": r.id,
+        "score": r.score,
+        "pregunta": str(r.payload.get("metadata", {}).get("pregunta", "")),
+        "grupo": str(r.payload.get("metadata", {}).get("grupo", "")),
+        "tema": str(r.payload.get("metadata", {}).get("tema", "") or "")
+    }
+
 @router.get("/search")
-def semantic_search(query: str, category: str = None, limit: int = 5, embedding_type: str = "openai"):
+async def semantic_search(query: str, category: str = None, limit: int = 5, embedding_type: str = "openai"):
     logger.info(f"Received search request - query: {query}, category: {category}, limit: {limit}, embedding_type: {embedding_type}")
-    results = search_service.search(query, category, limit, embedding_type)
+    results = await _with_timeout(search_service.asearch(query, category, limit, embedding_type))
     logger.info(f"Search completed, found {len(results)} results")
-    response = [
-        {
-            "id": r.id,
-            "score": r.score,
-            "pregunta": str(r.payload.get("metadata", {}).get("pregunta", "")),
-            "grupo": str(r.payload.get("metadata", {}).get("grupo", "")),
-            "tema": str(r.payload.get("metadata", {}).get("tema", "") or "")
-        } for r in results
-    ]
+    with timed("search", "response"):
+        response = [_summary(r) for r in results]
+
+    return response
+
+class BatchQuery(BaseModel):
+    query: str
+    category: Optional[str] = None
+    limit: int = 5
+    threshold: float = 0.0
 
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery]
+    embedding_type: str = "openai"
+
+@router.post("/search/batch")
+async def batch_search(request: BatchSearchRequest):
+    max_batch = int(os.getenv("SEARCH_BATCH_MAX", 256))
+    if len(request.queries) > max_batch:
+        raise HTTPException(status_code=413, detail=f"At most {max_batch} queries per batch")
+    logger.info(f"Received batch search request - {len(request.queries)} queries, embedding_type: {request.embedding_type}")
+    queries = [
+        {"query": q.query, "category": q.category, "limit": q.limit, "threshold": q.threshold}
+        for q in request.queries
+    ]
+    batches = await _with_timeout(search_service.asearch_batch(queries, request.embedding_type))
+    with timed("search_batch", "response"):
+        # One result list per query, in request order
+        response = [[_summary(r) for r in results] for results in batches]
     return response
 
 @router.get("/article/{article_id}")
-def get_article(article_id: str, embedding_type: str = "openai"):
+async def get_article(article_id: str, embedding_type: str = "openai"):
     logger.info(f"Received request for article with id: {article_id}, embedding_type: {embedding_type}")
-    article = search_service.get_article(article_id, embedding_type)
+    article = await _with_timeout(search_service.aget_article(article_id, embedding_type))
     if article:
         logger.info(f"Article found: {article.id}")
         return {
@@ -40,40 +83,53 @@ def get_article(article_id: str, embedding_type: str = "openai"):
     return {"error": "Article not found"}
 
 @router.get("/categories")
-def get_categories():
+async def get_categories(embedding_type: str = "openai"):
     logger.info("Received request for categories")
-    categories = search_service.get_categories()
+    categories = await _with_timeout(search_service.aget_categories(embedding_type))
     logger.info(f"Retrieved {len(categories)} categories")
     return categories
 
+@router.get("/categories/facets")
+async def get_facets(embedding_type: str = "openai"):
+    facets = await _with_timeout(search_service.aget_facets(embedding_type))
+    return {field: [{"value": value, "count": count} for value, count in pairs] for field, pairs in facets.items()}
+
+@router.get("/backends")
+async def get_backends():
+    return search_service.get_backend_stats()
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return search_service.get_cache_stats()
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @router.get("/rag_search")
-def rag_search(query: str, category: str = None):
-    logger.info(f"Received RAG search request - query: {query}, category: {category}")
-    results = search_service.rag_search(query, category)
-    response = [
-            {
-                "id": source.get("_id"),
-                "score": 1.0,  # RAG doesn't provide a score, so we use a default value
-                "pregunta": source.get("pregunta", ""),
-                "grupo": str(source.get("grupo", "")),
-                "tema": str(source.get("tema", "") or "")
-            } for source in results["sources"]
-        ]
-    logger.info(f"RAG search completed, answer generated with {len(response)} source documents")
-    return response
+async def rag_search(query: str, category: str = None, embedding_type: str = "openai", threshold: float = 0.0, stream: bool = True):
+    logger.info(f"Received RAG search request - query: {query}, category: {category}, embedding_type: {embedding_type}, stream: {stream}")
+    if not stream:
+        result = await _with_timeout(search_service.arag_search(query, category, embedding_type, threshold))
+        return {"answer": result["answer"], "sources": [_summary(r) for r in result["sources"]], "timings": result["timings"]}
+
+    async def events():
+        # Server-sent events: sources first, then answer tokens as they arrive, then timings
+        try:
+            async for event, data in search_service.astream_rag(query, category, embedding_type, threshold):
+                if event == "sources":
+                    data = [_summary(r) for r in data]
+                yield _sse(event, data)
+        except asyncio.TimeoutError:
+            logger.warning("RAG answer timed out")
+            yield _sse("error", {"detail": "Upstream call timed out"})
+        yield _sse("done", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @router.get("/search-with-ai-validation")
-def search_with_ai_validation(query: str, category: str = None, limit: int = 15, threshold: float = 0.0, embedding_type: str = "openai"):
+async def search_with_ai_validation(query: str, category: str = None, limit: int = 15, threshold: float = 0.0, embedding_type: str = "openai", mode: str = None):
     logger.info(f"Received AI-validated search request - query: {query}, category: {category}, limit: {limit}, threshold: {threshold}, embedding_type: {embedding_type}")
-    results = search_service.search_with_ai_validation(query, category, limit, threshold, embedding_type)
+    results = await _with_timeout(search_service.asearch_with_ai_validation(query, category, limit, threshold, embedding_type, mode))
     logger.info(f"AI-validated search completed, found {len(results)} validated results")
-    response = [
-        {
-            "id": r.id,
-            "score": r.score,
-            "pregunta": str(r.payload.get("metadata", {}).get("pregunta", "")),
-            "grupo": str(r.payload.get("metadata", {}).get("grupo", "")),
-            "tema": str(r.payload.get("metadata", {}).get("tema", "") or "")
-        } for r in results
-    ]
+    response = [_summary(r) for r in results]
     return response
\ No newline at end of file
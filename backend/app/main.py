@@ -4,7 +4,9 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 from fastapi import FastAPI
-from .api.routes.search import router as search_router
+from fastapi.responses import PlainTextResponse
+from .api.routes.search import router as search_router, search_service
+from .services.metrics import render
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
@@ -32,6 +34,29 @@ logger.info("CORS middleware added")
 app.include_router(search_router)
 logger.info("Search router included")
 
+@app.on_event("startup")
+def preload_backends():
+    # PRELOAD_BACKENDS lists backends to load before serving; the rest load on first request
+    search_service.preload()
+    logger.info(f"Backends after startup: {search_service.get_backend_stats()}")
+
+def _gauges(prefix, stats):
+    # Flattens nested numeric stats into gauge names, e.g. cache_results_hit_rate
+    gauges = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            gauges.update(_gauges(f"{prefix}_{key}", value))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            gauges[f"{prefix}_{key}"] = value
+    return gauges
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format: stage histograms, upstream call and cache counters, cache and memory gauges
+    gauges = _gauges("cache", search_service.get_cache_stats())
+    gauges["process_rss_mb"] = search_service.get_backend_stats()["rss_mb"]
+    return render(gauges)
+
 if __name__ == "__main__":
     logger.info(f"Running the app with SSL on host: 0.0.0.0 and port: 8000")
     uvicorn.run(
@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import math
+import shutil
+import logging
+from array import array
+from collections import Counter
+import numpy as np
+from .paths import state_path, ReloadingFile
+
+logger = logging.getLogger(__name__)
+
+# Same character filter as preprocessing.preprocess_html, so queries tokenize like ingested texts
+_NON_TEXT_RE = re.compile(r'[^a-zA-Z0-9\s.,!?]')
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_META_FILE = "meta.json"
+_ARRAYS = ("offsets", "postings", "frequencies", "doc_ids", "doc_lengths", "grupos")
+_NO_GRUPO = -1
+_MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(_NON_TEXT_RE.sub(' ', str(text)).lower())
+
+
+def _index_dir(collection_name):
+    return state_path(f"bm25_{collection_name}")
+
+
+class BM25Index:
+    # Inverted index in CSR form: the postings of term t are postings[offsets[t]:offsets[t + 1]],
+    # stored as int32 document positions with uint16 term frequencies
+    def __init__(self, vocabulary, offsets, postings, frequencies, doc_ids, doc_lengths, grupos, k1=1.2, b=0.75):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+        self.frequencies = frequencies
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.grupos = grupos
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, documents):
+        # documents: iterable of (article id, preprocessed text, grupo)
+        vocabulary = {}
+        term_ids, positions, frequencies = array('i'), array('i'), array('H')
+        doc_ids, doc_lengths, grupos = array('q'), array('i'), array('q')
+        for position, (doc_id, text, grupo) in enumerate(documents):
+            tokens = tokenize(text)
+            doc_ids.append(int(doc_id))
+            doc_lengths.append(len(tokens))
+            grupos.append(int(grupo) if isinstance(grupo, (int, np.integer)) else _NO_GRUPO)
+            for term, count in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                positions.append(position)
+                frequencies.append(min(count, _MAX_TF))
+
+        term_ids = np.frombuffer(term_ids, dtype=np.int32) if term_ids else np.zeros(0, dtype=np.int32)
+        order = np.argsort(term_ids, kind='stable')
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=offsets[1:])
+        return cls(
+            vocabulary,
+            offsets,
+            np.frombuffer(positions, dtype=np.int32)[order] if positions else np.zeros(0, dtype=np.int32),
+            np.frombuffer(frequencies, dtype=np.uint16)[order] if frequencies else np.zeros(0, dtype=np.uint16),
+            np.frombuffer(doc_ids, dtype=np.int64).copy() if doc_ids else np.zeros(0, dtype=np.int64),
+            np.frombuffer(doc_lengths, dtype=np.int32).copy() if doc_lengths else np.zeros(0, dtype=np.int32),
+            np.frombuffer(grupos, dtype=np.int64).copy() if grupos else np.zeros(0, dtype=np.int64),
+        )
+
+    def save(self, directory):
+        # Written to a temporary directory and swapped in, so searchers never load a half-written index
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_dir, _META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"vocabulary": self.vocabulary, "k1": self.k1, "b": self.b}, f, ensure_ascii=False)
+        old_dir = f"{directory}.{os.getpid()}.old"
+        if os.path.exists(directory):
+            os.rename(directory, old_dir)
+        os.rename(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, _META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        return cls(meta["vocabulary"], k1=meta["k1"], b=meta["b"], **arrays)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def search(self, query, limit, grupo=None):
+        # Returns [(article id, bm25 score)] best first, optionally restricted to one grupo
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        if not term_ids or not len(self):
+            return []
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            positions = self.postings[start:end]
+            tf = self.frequencies[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[positions] / self.avg_doc_length)
+            scores[positions] += idf * tf * (self.k1 + 1) / (tf + norm)
+        if grupo is not None:
+            scores[self.grupos != int(grupo)] = 0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(int(self.doc_ids[position]), float(scores[position])) for position in candidates]
+
+
+def write_bm25_index(collection_name, documents):
+    index = BM25Index.build(documents)
+    index.save(_index_dir(collection_name))
+    logger.info(f"BM25 index for {collection_name}: {len(index)} documents, {len(index.vocabulary)} terms, {len(index.postings)} postings")
+    return index
+
+
+class PersistedBM25Index:
+    # Loads the index written by ingestion and reloads it when a newer one is swapped in
+    def __init__(self, collection_name):
+        self.directory = _index_dir(collection_name)
+        # save() writes the meta file last, so its mtime changes whenever a new index is swapped in
+        self._file = ReloadingFile(os.path.join(self.directory, _META_FILE), lambda path: BM25Index.load(self.directory))
+
+    def get(self):
+        return self._file.get()
+
+
+def reciprocal_rank_fusion(rankings, weights, k=60):
+    # rankings: lists of ids best first; returns {id: fused score}
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank + 1)
+    return fused
@@ -0,0 +1,67 @@
+import os
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_NAMESPACE = uuid.UUID("6f1c3f0e-2b7a-4c55-9d0e-8a4b2f1e7c11")
+
+
+class ChunkingConfig:
+    def __init__(self, size=None, overlap=None, scoring=None, group_size=None):
+        self.size = int(size if size is not None else os.getenv("CHUNK_SIZE", 0))
+        self.overlap = int(overlap if overlap is not None else os.getenv("CHUNK_OVERLAP", 32))
+        self.scoring = (scoring or os.getenv("CHUNK_SCORING", "max")).lower()
+        self.group_size = int(group_size or os.getenv("CHUNK_GROUP_SIZE", 3))
+        if self.scoring not in ("max", "sum"):
+            raise ValueError(f"Unsupported chunk scoring: {self.scoring}")
+        if self.enabled and not 0 <= self.overlap < self.size:
+            raise ValueError("CHUNK_OVERLAP must be smaller than CHUNK_SIZE")
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def signature(self):
+        # Part of each point's content hash, so changing the chunking re-ingests articles in delta mode
+        return {"chunk_size": self.size, "chunk_overlap": self.overlap} if self.enabled else None
+
+
+class Tokenizer:
+    # Counts in the embedding model's tokens when tiktoken is available, otherwise in words
+    def __init__(self):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            logger.warning("tiktoken not installed, chunking by words instead of tokens")
+            self._encoding = None
+
+    def encode(self, text):
+        return self._encoding.encode(text) if self._encoding else text.split()
+
+    def decode(self, tokens):
+        return self._encoding.decode(tokens) if self._encoding else " ".join(tokens)
+
+
+def chunk_text(tokenizer, title, body, size, overlap):
+    # Sliding windows of `size` tokens over the body, each prefixed with the title so a
+    # chunk from the middle of a long answer still carries what the article is about
+    title_tokens = tokenizer.encode(title)
+    body_tokens = tokenizer.encode(body)
+    window = max(size - len(title_tokens), overlap + 1)
+    if len(body_tokens) <= window:
+        return [f"{title} {body}".strip()]
+    chunks = []
+    for start in range(0, len(body_tokens), window - overlap):
+        chunks.append(f"{title} {tokenizer.decode(body_tokens[start:start + window])}".strip())
+        if start + window >= len(body_tokens):
+            break
+    return chunks
+
+
+def chunk_point_id(article_id, chunk_index):
+    # The first chunk keeps the article id, so retrieving an article by id still works
+    if chunk_index == 0:
+        return article_id
+    return str(uuid.uuid5(_CHUNK_NAMESPACE, f"{article_id}:{chunk_index}"))
@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+from collections import Counter
+import numpy as np
+import fasttext
+from .hashing import content_hash
+from .paths import state_path, atomic_write
+from .preprocessing import preprocess_many
+from .source_reader import SourceReader
+
+logger = logging.getLogger(__name__)
+
+GALICIAN_LABELS = ("__label__gl", "__label__pt")
+_TOP_WORDS = 1000
+_PROFILE_VERSION = 1
+
+
+def _grupo_key(value):
+    # JSON object keys are strings; integral floats (grupo read with gaps) print as ints
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def build_profile(records, lang_model=None, language_threshold=0.0):
+    # Every statistic Analysis reports, computed from one pass over the live articles
+    records = list(records)
+    preguntas = [str(record["pregunta"]) for record in records]
+    respuestas = [str(record["respuesta"]) for record in records]
+    # Language and the word-count distribution use the accent-stripped text; top words and
+    # per-group word counts keep accents, as the original Analysis methods did
+    plain_respuestas = preprocess_many(respuestas)
+    plain_counts = np.array([
+        len(p.split()) + len(r.split()) for p, r in zip(preprocess_many(preguntas), plain_respuestas)
+    ], dtype=np.int64)
+    accent_preguntas = preprocess_many(preguntas, keep_accent=True)
+    accent_respuestas = preprocess_many(respuestas, keep_accent=True)
+
+    word_freq = Counter()
+    accent_counts = np.zeros(len(records), dtype=np.int64)
+    for i, (p, r) in enumerate(zip(accent_preguntas, accent_respuestas)):
+        words = p.split() + r.split()
+        word_freq.update(words)
+        accent_counts[i] = len(words)
+
+    group_word_counts = {}
+    for record, count in zip(records, accent_counts.tolist()):
+        grupo = record["grupo"]
+        # Rows without a grupo are left out, like DataFrame.value_counts()
+        if grupo is not None and grupo == grupo:
+            group_word_counts.setdefault(_grupo_key(grupo), []).append(count)
+
+    language = None
+    if lang_model is not None and records:
+        # One batched predict over all documents instead of one call per row
+        labels, probabilities = lang_model.predict(plain_respuestas, k=1)
+        top_labels = np.array([label[0] if len(label) else "" for label in labels])
+        top_probabilities = np.array([p[0] if len(p) else 0.0 for p in probabilities], dtype=np.float32)
+        galician = np.isin(top_labels, GALICIAN_LABELS) & (top_probabilities >= language_threshold)
+        language = {
+            "galician_share": float(galician.mean()),
+            "labels": dict(Counter(top_labels.tolist()).most_common()),
+        }
+
+    return {
+        "documents": len(records),
+        "total_words": int(plain_counts.sum()),
+        "word_counts": plain_counts.tolist(),
+        "top_words": word_freq.most_common(_TOP_WORDS),
+        "group_counts": {key: len(counts) for key, counts in sorted(group_word_counts.items(), key=lambda item: -len(item[1]))},
+        "group_word_counts": group_word_counts,
+        "language": language,
+    }
+
+
+def _profile_path(signature):
+    return state_path(f"corpus_profile_{signature[:16]}.json")
+
+
+def load_or_build_profile(file_path, lang_model=None, lang_model_path=None, language_threshold=0.0):
+    # Cached on disk per (source file version, language model, threshold)
+    reader = SourceReader(file_path)
+    model_signature = None
+    if lang_model_path:
+        stat = os.stat(lang_model_path)
+        model_signature = [os.path.abspath(lang_model_path), stat.st_size, stat.st_mtime_ns]
+    signature = content_hash(reader.signature(), model_signature, language_threshold, _PROFILE_VERSION)
+    path = _profile_path(signature)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    if lang_model is None and lang_model_path:
+        # Loading the model takes seconds, so it only happens on a cache miss
+        lang_model = fasttext.load_model(lang_model_path)
+    profile = build_profile(reader, lang_model, language_threshold)
+    with atomic_write(path, encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False)
+    logger.info(f"Corpus profile of {file_path}: {profile['documents']} documents, {profile['total_words']} words, cached at {path}")
+    return profile
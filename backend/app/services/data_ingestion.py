@@ -1,14 +1,11 @@
 import os
+import re
 from dotenv import load_dotenv
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-import pandas as pd
 from tqdm import tqdm
-import re
-from bs4 import BeautifulSoup
 from langchain_community.embeddings import OpenAIEmbeddings
 from langchain.embeddings.base import Embeddings
-from langchain_community.vectorstores import Qdrant
 import numpy as np
 from scipy.stats import spearmanr
 from sklearn.metrics.pairwise import cosine_similarity
@@ -17,16 +14,66 @@ import mlflow
 from mlflow.models import infer_signature
 import tempfile
 import yaml
+import time
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from .train_fasttext import FastTextTrainer
+from .hashing import content_hash
+from .preprocessing import preprocess_html, preprocess_many
+from .source_reader import SourceReader
+from .embedding_cache import with_embedding_cache
+from .result_cache import bump_collection_version
+from .facet_index import write_facets
+from .bm25_index import write_bm25_index
+from .chunking import ChunkingConfig, Tokenizer, chunk_text, chunk_point_id
+from .metrics import observe, stage_summary
+from .matryoshka import LARGE_MODEL, MatryoshkaEmbeddings, large_dimensions, reduced_collection_name
+from .verdict_cache import get_verdict_cache, verdict_cache_enabled, article_hash
 
 load_dotenv()
 
 import logging
 logger = logging.getLogger(__name__)
 
+def _to_payload_value(value):
+    # Qdrant payloads must be JSON serializable: unwrap numpy scalars and drop NaNs
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+def _to_category_value(value):
+    # grupo is filtered with an integer payload index; pandas reads it as float when the column has gaps
+    value = _to_payload_value(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def process_record(record):
+    pregunta_html = str(record['pregunta'])
+    respuesta_html = str(record['respuesta'])
+    
+    pregunta_text = preprocess_html(pregunta_html)
+    respuesta_text = preprocess_html(respuesta_html)
+    
+    full_text = pregunta_text + ' ' + respuesta_text
+    
+    metadata = {
+        'id': int(record['id']),
+        'pregunta': pregunta_html,
+        'respuesta': respuesta_html,
+        'grupo': _to_category_value(record['grupo']),
+        'tema': _to_payload_value(record['tema'])
+    }
+    
+    return full_text, metadata
+
 class FastTextEmbeddings(Embeddings):
-    def __init__(self, model_path, get_preprocessed_texts_func, config_path):
-        self.trainer = FastTextTrainer(model_path, get_preprocessed_texts_func, config_path)
+    def __init__(self, model_path, get_preprocessed_texts_func, config_path, get_records_func=None):
+        self.model_path = model_path
+        self.trainer = FastTextTrainer(model_path, get_preprocessed_texts_func, config_path, get_records_func)
         self.model = self.trainer.load_or_train_model()
 
     def embed_documents(self, texts):
@@ -35,113 +82,384 @@ class FastTextEmbeddings(Embeddings):
     def embed_query(self, text):
         return self.model.get_sentence_vector(text).tolist()
 
+INGEST_MODES = ("full", "delta", "shadow")
+
+VECTOR_QUANTIZATIONS = ("none", "scalar", "binary")
+
+def quantization_config(kind):
+    # Quantized vectors stay in RAM for candidate search; originals are kept for rescoring
+    if kind not in VECTOR_QUANTIZATIONS:
+        raise ValueError(f"Unsupported vector quantization: {kind}")
+    if kind == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=float(os.getenv("SCALAR_QUANTILE", 0.99)),
+            always_ram=True
+        ))
+    if kind == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+PAYLOAD_INDEXES = {
+    "metadata.grupo": models.PayloadSchemaType.INTEGER,
+    "metadata.tema": models.PayloadSchemaType.KEYWORD,
+    "article_id": models.PayloadSchemaType.INTEGER,
+}
+
 class DataIngestionService:
-    def __init__(self, file_path):
+    def __init__(self, file_path, batch_size=None, workers=None, mode=None):
         logger.info("Initializing DataIngestionService")
         self.file_path = file_path
+        self.batch_size = int(batch_size or os.getenv("UPSERT_BATCH_SIZE", 100))
+        self.workers = int(workers or os.getenv("INGEST_WORKERS", 4))
+        self.mode = (mode or os.getenv("INGEST_MODE", "full")).lower()
+        if self.mode not in INGEST_MODES:
+            raise ValueError(f"Unsupported ingestion mode: {self.mode}")
         self.path = os.getenv("VECTOR_DB_PATH")
         if not os.path.exists(self.path):
             os.makedirs(self.path)
         self.client = QdrantClient(path=self.path)
         self.collection_name = os.getenv("QDRANT_COLLECTION_NAME")
+        # Set for text-embedding-3-large: the full-width collection reduced-dimension ones derive from
+        self.large_collection = None
+        self.chunking = ChunkingConfig()
+        self.quantization = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+        quantization_config(self.quantization)
+        self.tokenizer = Tokenizer() if self.chunking.enabled else None
         
         embedding_type = os.getenv("EMBEDDING_TYPE", "openai").lower()
         if embedding_type == "openai":
-            self.embeddings = OpenAIEmbeddings(
-                model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-large"),
+            model = os.getenv("OPENAI_EMBEDDING_MODEL", LARGE_MODEL)
+            self.embeddings = with_embedding_cache(OpenAIEmbeddings(
+                model=model,
                 openai_api_key=os.getenv("OPENAI_API_KEY")
-            )
+            ))
+            if model == LARGE_MODEL:
+                self.large_collection = self.collection_name
+            if model == LARGE_MODEL and large_dimensions():
+                # Reduced-dimension vectors go to their own collection, e.g. articles_openai_256
+                self.embeddings = MatryoshkaEmbeddings(self.embeddings, large_dimensions())
+                self.collection_name = reduced_collection_name(self.collection_name, large_dimensions())
             self.vector_size = len(self.embeddings.embed_query("test"))
         elif embedding_type == "fasttext":
             fasttext_model_path = os.getenv("FASTTEXT_MODEL_PATH")
             fasttext_config_path = os.getenv("FASTTEXT_CONFIG_PATH")
             if not fasttext_model_path or not fasttext_config_path:
                 raise ValueError("FASTTEXT_MODEL_PATH and FASTTEXT_CONFIG_PATH must be set when using FastText embeddings")
-            self.embeddings = FastTextEmbeddings(fasttext_model_path, self.get_preprocessed_texts, fasttext_config_path)
-            self.vector_size = 300  # FastText embeddings size
+            self.embeddings = with_embedding_cache(FastTextEmbeddings(fasttext_model_path, self.get_preprocessed_texts, fasttext_config_path, self._load_and_filter_data))
+            # A sweep may promote a model of any dim, so take the size from the model itself
+            self.vector_size = self.embeddings.model.get_dimension()
         else:
             raise ValueError(f"Unsupported embedding type: {embedding_type}")
-        
-        self.ensure_collection()
-        
-        vector_store = Qdrant(
-            client=self.client,
-            collection_name=self.collection_name,
-            embeddings=self.embeddings
-        )
 
-    def ensure_collection(self):
-        logger.info(f"Ensuring collection: {self.collection_name}")
+    def _get_alias_target(self, alias_name):
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == alias_name:
+                return alias.collection_name
+        return None
+
+    def _large_collections(self):
+        # Reduced-dimension search reranks with the full-width vectors, so re-ingesting either
+        # the full or a reduced collection invalidates cached results of all of them
+        if not self.large_collection:
+            return []
+        names = [collection.name for collection in self.client.get_collections().collections]
+        names += [alias.alias_name for alias in self.client.get_aliases().aliases]
+        reduced = re.compile(rf"{re.escape(self.large_collection)}_\d+")
+        return [self.large_collection] + [name for name in names if reduced.fullmatch(name)]
+
+    def _collection_exists(self, collection_name):
         collections = self.client.get_collections().collections
-        if any(collection.name == self.collection_name for collection in collections):
-            logger.info(f"Removing existing collection: {self.collection_name}")
-            self.client.delete_collection(self.collection_name)
-        
-        logger.info(f"Creating new collection: {self.collection_name}")
+        return any(collection.name == collection_name for collection in collections)
+
+    def _resolve_collection(self):
+        # QDRANT_COLLECTION_NAME may be an alias once a shadow build has been swapped in
+        return self._get_alias_target(self.collection_name) or self.collection_name
+
+    def _ensure_payload_indexes(self, collection_name):
+        # Lets Qdrant filter on category during HNSW traversal instead of scanning payloads
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True
+            )
+
+    def _create_collection(self, collection_name):
+        logger.info(f"Creating new collection: {collection_name}")
+        quantized = quantization_config(self.quantization)
         self.client.create_collection(
-            collection_name=self.collection_name,
-            vectors_config=models.VectorParams(size=self.vector_size, distance=models.Distance.COSINE)
+            collection_name=collection_name,
+            # With quantization the full vectors are only read for rescoring, so they can live on disk
+            vectors_config=models.VectorParams(size=self.vector_size, distance=models.Distance.COSINE, on_disk=quantized is not None),
+            quantization_config=quantized
         )
-        logger.info(f"Collection {self.collection_name} created successfully")
+        self._ensure_payload_indexes(collection_name)
+        logger.info(f"Collection {collection_name} created successfully")
+
+    def _ensure_quantization(self, collection_name):
+        # Delta runs reuse the collection, so apply a changed VECTOR_QUANTIZATION in place
+        quantized = quantization_config(self.quantization)
+        if self.client.get_collection(collection_name).config.quantization_config != quantized:
+            logger.info(f"Setting {self.quantization} quantization on {collection_name}")
+            self.client.update_collection(collection_name, quantization_config=quantized or models.Disabled.DISABLED)
+
+    def ensure_collection(self, recreate=True):
+        collection_name = self._resolve_collection()
+        logger.info(f"Ensuring collection: {collection_name}")
+        if self._collection_exists(collection_name):
+            if not recreate:
+                size = self.client.get_collection(collection_name).config.params.vectors.size
+                if size != self.vector_size:
+                    raise ValueError(f"Collection {collection_name} holds {size}-dim vectors but the embedding model produces "
+                                     f"{self.vector_size}; re-ingest in full or shadow mode")
+                self._ensure_payload_indexes(collection_name)
+                self._ensure_quantization(collection_name)
+                return collection_name
+            logger.info(f"Removing existing collection: {collection_name}")
+            self.client.delete_collection(collection_name)
+        self._create_collection(collection_name)
+        return collection_name
+
+    def swap_alias(self, shadow_collection):
+        # Point the public collection name at the freshly built shadow collection in one atomic operation
+        previous = self._get_alias_target(self.collection_name)
+        operations = []
+        if previous:
+            operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=self.collection_name)))
+        elif self._collection_exists(self.collection_name):
+            # One-time migration: a physical collection still owns the name the alias needs
+            logger.warning(f"Replacing physical collection {self.collection_name} with an alias")
+            self.client.delete_collection(self.collection_name)
+        operations.append(models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=shadow_collection, alias_name=self.collection_name)
+        ))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        logger.info(f"Alias {self.collection_name} now points to {shadow_collection}")
+
+        if previous and previous != shadow_collection:
+            logger.info(f"Removing previous collection: {previous}")
+            self.client.delete_collection(previous)
+
+    def _get_stored_hashes(self, collection_name):
+        hashes = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=['content_hash', 'article_id'],
+                with_vectors=False
+            )
+            for point in points:
+                # Chunks share their article's hash; points written before chunking have no article_id
+                payload = point.payload or {}
+                hashes[payload.get('article_id', point.id)] = payload.get('content_hash')
+            if offset is None:
+                return hashes
 
     def preprocess_text(self, html_content):
         logger.debug("Preprocessing text")
-        # Remove HTML tags
-        soup = BeautifulSoup(html_content, 'html.parser')
-        text = soup.get_text()
-        
-        # Remove special characters but keep some punctuation
-        text = re.sub(r'[^a-zA-Z0-9\s.,!?]', ' ', text)
-        
-        # Convert to lowercase and remove extra whitespace
-        text = text.lower().strip()
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text
+        return preprocess_html(html_content)
 
     def _load_and_filter_data(self):
-        df = pd.read_excel(self.file_path)
-        df = df[df['obsoleto'].isna()]
-        df = df[df['revisado'] == 's']
-        return df.reset_index(drop=True)
+        # Live rows streamed from the workbook, or from its snapshot once one pass has completed
+        return SourceReader(self.file_path)
 
     def _process_row(self, row):
-        pregunta_html = str(row['pregunta'])
-        respuesta_html = str(row['respuesta'])
-        
-        pregunta_text = self.preprocess_text(pregunta_html)
-        respuesta_text = self.preprocess_text(respuesta_html)
-        
-        full_text = pregunta_text + ' ' + respuesta_text
-        
-        metadata = {
-            'id': int(row['id']),
-            'pregunta': pregunta_html,
-            'respuesta': respuesta_html,
-            'grupo': row['grupo'],
-            'tema': row['tema']
-        }
-        
-        return full_text, metadata
+        return process_record(row)
+
+    def _process_rows(self, records):
+        records = list(records)
+        # One pass over every distinct html field (over processes for large exports); process_record
+        # and later stages (chunk titles, FastText training) then hit the memo
+        preprocess_many([str(record[field]) for record in records for field in ('pregunta', 'respuesta')], workers=self.workers)
+        return [process_record(record) for record in records]
 
     def get_preprocessed_texts(self):
-        df = self._load_and_filter_data()
-        return [self._process_row(row)[0] for _, row in df.iterrows()]
+        return [full_text for full_text, _ in self._process_rows(self._load_and_filter_data())]
+
+    def _article_hash(self, full_text, metadata):
+        signature = self.chunking.signature()
+        return content_hash(full_text, metadata, signature) if signature else content_hash(full_text, metadata)
+
+    def _to_points(self, rows):
+        # One point per article, or per chunk of its respuesta when CHUNK_SIZE is set. Only chunk 0
+        # (the article id) carries the whole metadata; search looks it up for hits on other chunks.
+        points = []
+        for full_text, metadata in rows:
+            if self.chunking.enabled:
+                title = preprocess_html(str(metadata['pregunta']))
+                body = full_text[len(title):].strip()
+                texts = chunk_text(self.tokenizer, title, body, self.chunking.size, self.chunking.overlap)
+            else:
+                texts = [full_text]
+            article_hash_value = self._article_hash(full_text, metadata)
+            # The other chunks keep grupo/tema for filtering and the hash that delta runs use to drop stale chunks
+            chunk_metadata = {field: metadata[field] for field in ('grupo', 'tema') if field in metadata}
+            for index, text in enumerate(texts):
+                points.append((chunk_point_id(metadata['id'], index), text, {
+                    'page_content': text,
+                    'metadata': metadata if index == 0 else chunk_metadata,
+                    'content_hash': article_hash_value,
+                    'article_id': metadata['id'],
+                    'chunk_index': index,
+                    'chunk_count': len(texts),
+                }))
+        return points
+
+    def _embed_batch(self, batch):
+        texts = [text for _, text, _ in batch]
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+        observe("ingest", "embed_batch", elapsed)
+        return batch, vectors, elapsed
+
+    def _upsert_batch(self, collection_name, batch, vectors):
+        points = [
+            models.PointStruct(id=point_id, vector=list(vector), payload=payload)
+            for (point_id, _, payload), vector in zip(batch, vectors)
+        ]
+        start = time.perf_counter()
+        self.client.upsert(collection_name=collection_name, points=points, wait=True)
+        elapsed = time.perf_counter() - start
+        observe("ingest", "upsert_batch", elapsed)
+        return elapsed
+
+    def _embed_and_upsert(self, collection_name, rows):
+        # Embed batches on a bounded thread pool and upsert them in order as they complete.
+        # At most 2 * workers batches are in flight so memory stays bounded on large exports.
+        batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        stats = {'embeddings': 0, 'embed_seconds': 0.0, 'upsert_seconds': 0.0, 'upserts': 0}
+        max_in_flight = self.workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, tqdm(total=len(rows)) as progress:
+            pending = []
+            next_batch = 0
+            while next_batch < len(batches) or pending:
+                while next_batch < len(batches) and len(pending) < max_in_flight:
+                    pending.append(executor.submit(self._embed_batch, batches[next_batch]))
+                    next_batch += 1
+                batch, vectors, embed_seconds = pending.pop(0).result()
+                stats['embeddings'] += len(vectors)
+                stats['embed_seconds'] += embed_seconds
+                stats['upsert_seconds'] += self._upsert_batch(collection_name, batch, vectors)
+                stats['upserts'] += 1
+                progress.update(len(batch))
+        return stats
 
     def ingest_data(self):
         logger.info(f"Starting data ingestion from file: {self.file_path}")
-        df = self._load_and_filter_data()
-        total_rows = len(df)
-        logger.info(f"Total rows to process: {total_rows}")
-        
-        vector_store = Qdrant(
-            client=self.client,
-            collection_name=self.collection_name,
-            embeddings=self.embeddings
-        )
+        start = time.perf_counter()
+        records = list(self._load_and_filter_data())
+        total_rows = len(records)
+        logger.info(f"Total rows to process: {total_rows}, batch size: {self.batch_size}, workers: {self.workers}")
 
-        for _, row in tqdm(df.iterrows(), total=total_rows):
-            full_text, metadata = self._process_row(row)
-            vector_store.add_texts(texts=[full_text], metadatas=[metadata])
+        rows = self._process_rows(records)
+        preprocess_seconds = time.perf_counter() - start
+        current_article_hashes = {str(metadata['id']): article_hash(metadata) for _, metadata in rows}
+        current_metadatas = [metadata for _, metadata in rows]
+        lexical_documents = [(metadata['id'], full_text, metadata['grupo']) for full_text, metadata in rows]
 
-        logger.info("Data ingestion completed.")
\ No newline at end of file
+        deleted_ids = []
+        # Once the collection name is an alias a full rebuild must also go through a shadow collection
+        shadow = self.mode == "shadow" or (self.mode == "full" and self._get_alias_target(self.collection_name))
+        if self.mode == "delta":
+            collection_name = self.ensure_collection(recreate=False)
+            stored_hashes = self._get_stored_hashes(collection_name)
+            current_ids = {metadata['id'] for _, metadata in rows}
+            # Articles that became obsoleto/unreviewed or were removed from the export
+            deleted_ids = [point_id for point_id in stored_hashes if point_id not in current_ids]
+            rows = [
+                (full_text, metadata) for full_text, metadata in rows
+                if stored_hashes.get(metadata['id']) != self._article_hash(full_text, metadata)
+            ]
+            logger.info(f"Delta ingestion: {len(rows)} new or changed, {len(deleted_ids)} to delete, {total_rows - len(rows)} unchanged")
+            if deleted_ids:
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=models.PointIdsList(points=deleted_ids),
+                    wait=True
+                )
+                # Remaining chunks of removed articles
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=models.FilterSelector(filter=models.Filter(
+                        must=[models.FieldCondition(key="article_id", match=models.MatchAny(any=deleted_ids))]
+                    )),
+                    wait=True
+                )
+        elif shadow:
+            # Unique per run, and never of the {name}_<digits> form used by reduced-dimension collections
+            collection_name = f"{self.collection_name}_shadow_{uuid.uuid4().hex}"
+            self._create_collection(collection_name)
+        else:
+            collection_name = self.ensure_collection()
+
+        try:
+            points = self._to_points(rows)
+            stats = self._embed_and_upsert(collection_name, points)
+        except Exception:
+            if shadow:
+                # The half-built shadow collection is never swapped in, so it would only leak disk
+                logger.warning(f"Ingestion failed, removing shadow collection {collection_name}")
+                self.client.delete_collection(collection_name)
+            raise
+        if self.mode == "delta" and rows:
+            # Drop chunks left over from the previous version of changed articles
+            self.client.delete(
+                collection_name=collection_name,
+                points_selector=models.FilterSelector(filter=models.Filter(
+                    must=[models.FieldCondition(key="article_id", match=models.MatchAny(any=[metadata['id'] for _, metadata in rows]))],
+                    must_not=[models.FieldCondition(key="content_hash", match=models.MatchAny(any=list({payload['content_hash'] for _, _, payload in points})))]
+                )),
+                wait=True
+            )
+
+        if shadow:
+            self.swap_alias(collection_name)
+        if rows or deleted_ids or shadow:
+            bump_collection_version(self.collection_name, collection_name, *self._large_collections())
+        if verdict_cache_enabled():
+            get_verdict_cache().prune(current_article_hashes)
+        facets = write_facets(self.collection_name, current_metadatas)
+        write_bm25_index(self.collection_name, lexical_documents)
+        elapsed = time.perf_counter() - start
+
+        report = {
+            'mode': self.mode,
+            'collection': collection_name,
+            'rows': total_rows,
+            'upserted': len(rows),
+            'deleted': len(deleted_ids),
+            'elapsed_seconds': elapsed,
+            'preprocess_seconds': preprocess_seconds,
+            'rows_per_second': total_rows / elapsed if elapsed else 0.0,
+            # Embedding calls run concurrently, so this is throughput over the wall time of the embed/upsert stage
+            'embeddings_per_second': stats['embeddings'] / (elapsed - preprocess_seconds) if stats['embeddings'] else 0.0,
+            'avg_embed_batch_seconds': stats['embed_seconds'] / stats['upserts'] if stats['upserts'] else 0.0,
+            'avg_upsert_seconds': stats['upsert_seconds'] / stats['upserts'] if stats['upserts'] else 0.0,
+            'upserts': stats['upserts'],
+            'categories': len(facets['grupo']),
+            'chunking': self.chunking.signature(),
+            'quantization': self.quantization,
+            'points': len(points),
+            'chunks_per_article': len(points) / len(rows) if rows else 0.0,
+            # Size of what this run wrote: float32 vectors plus JSON payloads (before Qdrant's own overhead)
+            'vector_mb': len(points) * self.vector_size * 4 / (1024 * 1024),
+            'payload_mb': sum(len(json.dumps(payload, ensure_ascii=False, default=str)) for _, _, payload in points) / (1024 * 1024),
+        }
+        cache = getattr(self.embeddings, 'cache', None) or getattr(getattr(self.embeddings, 'embeddings', None), 'cache', None)
+        if cache:
+            report['embedding_cache'] = cache.stats()
+        # Per-batch count/avg/max for embed and upsert; empty with METRICS=false
+        report['batch_latency'] = stage_summary("ingest")
+        logger.info(
+            f"Data ingestion ({self.mode}) completed: {total_rows} rows, {len(rows)} upserted, {len(deleted_ids)} deleted in {elapsed:.2f}s "
+            f"({report['rows_per_second']:.1f} rows/s, {report['embeddings_per_second']:.1f} embeddings/s, "
+            f"avg upsert latency {report['avg_upsert_seconds'] * 1000:.1f} ms over {stats['upserts']} batches)"
+        )
+        return report
@@ -0,0 +1,179 @@
+import os
+import asyncio
+import sqlite3
+import threading
+import unicodedata
+import re
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from .hashing import content_hash
+from .paths import state_path
+from .metrics import count_call, count_cache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_SQLITE_BATCH = 500
+
+
+def normalize_text(text):
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', str(text))).strip()
+
+
+def cache_model_name(embeddings):
+    # Identifies the embedding model so cached vectors are never shared between models
+    model_path = getattr(embeddings, 'model_path', None)
+    if model_path:
+        stat = os.stat(model_path)
+        name = f"fasttext:{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+        variant = getattr(getattr(embeddings, 'model', None), 'variant', None)
+        return f"{name}:{variant}" if variant else name
+    model = getattr(embeddings, 'model', None)
+    if isinstance(model, str):
+        return f"openai:{model}"
+    return type(embeddings).__name__
+
+
+class EmbeddingCache:
+    # Two-tier content-addressed cache: an in-memory LRU in front of a SQLite table of float32 vectors
+    def __init__(self, path=None, max_memory_items=None):
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH") or state_path("embedding_cache.sqlite")
+        self.max_memory_items = int(max_memory_items or os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", 10000))
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)")
+        self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        logger.info(f"Embedding cache at {self.path} (memory tier: {self.max_memory_items} items)")
+
+    @staticmethod
+    def make_key(model_name, text):
+        return content_hash(model_name, normalize_text(text))
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model_name, texts):
+        keys = [self.make_key(model_name, text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.memory_hits += len(found)
+
+            missing = list({key for key in keys if key not in found})
+            for i in range(0, len(missing), _SQLITE_BATCH):
+                chunk = missing[i:i + _SQLITE_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+            self.misses += sum(1 for key in keys if key not in found)
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def put_many(self, model_name, texts, vectors):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(model_name, text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, model_name, vector.tobytes()))
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    # Wraps any embedding backend so repeated texts are served from the cache instead of recomputed
+    def __init__(self, embeddings, cache=None, model_name=None):
+        self.embeddings = embeddings
+        self.cache = cache or get_embedding_cache()
+        self.model_name = model_name or cache_model_name(embeddings)
+
+    def __getattr__(self, name):
+        if name == 'embeddings':
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+
+    @staticmethod
+    def _count_lookups(vectors):
+        misses = sum(1 for vector in vectors if vector is None)
+        count_cache("embedding", "hit", len(vectors) - misses)
+        count_cache("embedding", "miss", misses)
+
+    def embed_documents(self, texts):
+        vectors = self.cache.get_many(self.model_name, texts)
+        self._count_lookups(vectors)
+        missing = {}
+        for text, vector in zip(texts, vectors):
+            if vector is None:
+                missing.setdefault(normalize_text(text), text)
+        if missing:
+            count_call("embedding", "embed_documents")
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            self.cache.put_many(self.model_name, list(missing.values()), computed)
+            by_text = dict(zip(missing.keys(), computed))
+            vectors = [
+                vector if vector is not None else list(by_text[normalize_text(text)])
+                for text, vector in zip(texts, vectors)
+            ]
+        return vectors
+
+    def embed_query(self, text):
+        vector = self.cache.get_many(self.model_name, [text])[0]
+        self._count_lookups([vector])
+        if vector is None:
+            count_call("embedding", "embed_query")
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.model_name, [text], [vector])
+        return vector
+
+    async def aembed_query(self, text):
+        # The disk tier is SQLite, so cache reads and writes stay off the event loop
+        vector = (await asyncio.to_thread(self.cache.get_many, self.model_name, [text]))[0]
+        self._count_lookups([vector])
+        if vector is None:
+            count_call("embedding", "embed_query")
+            if hasattr(self.embeddings, 'aembed_query'):
+                vector = await self.embeddings.aembed_query(text)
+            else:
+                vector = await asyncio.to_thread(self.embeddings.embed_query, text)
+            await asyncio.to_thread(self.cache.put_many, self.model_name, [text], [vector])
+        return vector
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache():
+    return EmbeddingCache()
+
+
+def with_embedding_cache(embeddings):
+    if os.getenv("EMBEDDING_CACHE", "true").lower() in ("0", "false", "no"):
+        return embeddings
+    return CachedEmbeddings(embeddings)
@@ -0,0 +1,51 @@
+import json
+import logging
+from collections import Counter
+from .paths import state_path, atomic_write, ReloadingFile
+
+logger = logging.getLogger(__name__)
+
+FACET_FIELDS = ("grupo", "tema")
+
+
+def _facet_path(collection_name):
+    return state_path(f"facets_{collection_name}.json")
+
+
+def build_facets(metadatas):
+    # [value, count] pairs rather than a JSON object so numeric grupo values keep their type
+    counts = {field: Counter() for field in FACET_FIELDS}
+    for metadata in metadatas:
+        for field in FACET_FIELDS:
+            value = metadata.get(field)
+            if value is not None:
+                counts[field][value] += 1
+    return {
+        field: sorted(([value, count] for value, count in counter.items()), key=lambda pair: (isinstance(pair[0], str), pair[0]))
+        for field, counter in counts.items()
+    }
+
+
+def _read_facets(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_facets(collection_name, metadatas):
+    # Ingestion always sees the whole live export, so the index is rebuilt from it on every
+    # run (full, shadow or delta) and matches the collection once the run completes
+    facets = build_facets(metadatas)
+    path = _facet_path(collection_name)
+    with atomic_write(path, encoding="utf-8") as f:
+        json.dump(facets, f, ensure_ascii=False)
+    logger.info(f"Facet index for {collection_name}: " + ", ".join(f"{len(facets[field])} {field}" for field in FACET_FIELDS))
+    return facets
+
+
+class FacetIndex:
+    # Serves the facet file written by ingestion, re-reading it only when its mtime changes
+    def __init__(self, collection_name):
+        self._file = ReloadingFile(_facet_path(collection_name), _read_facets)
+
+    def get(self):
+        return self._file.get()
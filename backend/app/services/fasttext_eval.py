@@ -0,0 +1,64 @@
+import time
+import numpy as np
+from .preprocessing import preprocess_many
+from .source_reader import iter_articles
+
+# Retrieval evaluation of a FastText model on our own articles: every pregunta is a held-out
+# query whose only relevant document is its article's respuesta
+RETRIEVAL_KS = (1, 5, 10)
+_QUERY_BATCH = 1024
+
+
+def retrieval_pairs(records=None):
+    records = list(records if records is not None else iter_articles())
+    queries = preprocess_many([str(record['pregunta']) for record in records], keep_accent=True)
+    documents = preprocess_many([str(record['respuesta']) for record in records], keep_accent=True)
+    return [(query, document) for query, document in zip(queries, documents) if query and document]
+
+
+def embed_matrix(model, texts):
+    # One float32 matrix of L2-normalized sentence vectors, so cosine similarity is a matrix product
+    matrix = np.empty((len(texts), model.get_dimension()), dtype=np.float32)
+    for i, text in enumerate(texts):
+        matrix[i] = model.get_sentence_vector(text)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class SentenceIndex:
+    # In-memory exact index: the document matrix, searched with batched matrix products
+    def __init__(self, model, documents):
+        start = time.perf_counter()
+        self.matrix = embed_matrix(model, documents)
+        self.embed_seconds = time.perf_counter() - start
+
+    def ranks(self, query_matrix, relevant):
+        # 1-based rank of each query's relevant document, without sorting the score rows
+        ranks = np.empty(len(query_matrix), dtype=np.int64)
+        for start in range(0, len(query_matrix), _QUERY_BATCH):
+            scores = query_matrix[start:start + _QUERY_BATCH] @ self.matrix.T
+            rows = np.arange(len(scores))
+            target = scores[rows, relevant[start:start + _QUERY_BATCH]]
+            ranks[start:start + _QUERY_BATCH] = (scores > target[:, None]).sum(axis=1) + 1
+        return ranks
+
+
+def evaluate_retrieval(model, pairs, ks=RETRIEVAL_KS):
+    if not pairs:
+        return {}
+    queries, documents = zip(*pairs)
+    index = SentenceIndex(model, documents)
+    start = time.perf_counter()
+    query_matrix = embed_matrix(model, queries)
+    query_embed_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    ranks = index.ranks(query_matrix, np.arange(len(pairs)))
+    search_seconds = time.perf_counter() - start
+
+    metrics = {f'recall_at_{k}': float(np.mean(ranks <= k)) for k in ks}
+    metrics['mrr'] = float(np.mean(1.0 / ranks))
+    metrics['median_rank'] = float(np.median(ranks))
+    metrics['documents_embedded_per_second'] = len(documents) / index.embed_seconds if index.embed_seconds else 0.0
+    metrics['queries_embedded_per_second'] = len(queries) / query_embed_seconds if query_embed_seconds else 0.0
+    metrics['queries_searched_per_second'] = len(queries) / search_seconds if search_seconds else 0.0
+    return metrics
@@ -0,0 +1,272 @@
+import os
+import json
+import shutil
+import logging
+from functools import lru_cache
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MATRIX_FILE = "input_matrix.npy"
+_CODES_FILE = "codes.npy"
+_CENTROIDS_FILE = "centroids.npy"
+_BUCKETS_FILE = "buckets.npy"
+_META_FILE = "meta.json"
+_EOS = "</s>"
+_BOW = "<"
+_EOW = ">"
+_PQ_CENTROIDS = 256
+_PQ_TRAIN_ROWS = 65536
+_PQ_ITERATIONS = 25
+_ENCODE_CHUNK = 65536
+
+
+def mmap_dir_for(model_path):
+    return os.getenv("FASTTEXT_MMAP_DIR") or f"{model_path}.mmap"
+
+
+def quantized_dir_for(model_path):
+    return os.getenv("FASTTEXT_QUANTIZED_DIR") or f"{model_path}.q"
+
+
+def _source_signature(model_path):
+    stat = os.stat(model_path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def _fnv1a(data):
+    # fastText's Dictionary::hash, including its sign extension of bytes >= 0x80
+    h = 2166136261
+    for byte in data:
+        h ^= (byte | 0xFFFFFF00) if byte >= 0x80 else byte
+        h = (h * 16777619) & 0xFFFFFFFF
+    return h
+
+
+def subword_hashes(word, minn, maxn, bucket):
+    # Port of Dictionary::computeSubwords over the UTF-8 bytes of "<word>"
+    data = (_BOW + word + _EOW).encode("utf-8")
+    hashes = []
+    for i in range(len(data)):
+        if (data[i] & 0xC0) == 0x80:
+            continue
+        j = i
+        n = 1
+        while j < len(data) and n <= maxn:
+            j += 1
+            while j < len(data) and (data[j] & 0xC0) == 0x80:
+                j += 1
+            if n >= minn and not (n == 1 and (i == 0 or j == len(data))):
+                hashes.append(_fnv1a(data[i:j]) % bucket)
+            n += 1
+    return hashes
+
+
+def _nearest_centroids(x, centroids):
+    distances = (x ** 2).sum(axis=1)[:, None] - 2 * x @ centroids.T + (centroids ** 2).sum(axis=1)[None, :]
+    return distances.argmin(axis=1)
+
+
+def _kmeans(x, k, rng):
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(_PQ_ITERATIONS):
+        assignment = _nearest_centroids(x, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, x)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def product_quantize(matrix, dsub, seed=0):
+    # Splits every row into dim / dsub sub-vectors and replaces each with the index of its
+    # nearest of 256 centroids learned on a sample of rows, as fastText's ProductQuantizer does
+    rows, dim = matrix.shape
+    if dim % dsub:
+        raise ValueError(f"dsub={dsub} must divide the embedding dimension {dim}")
+    nsub = dim // dsub
+    k = min(_PQ_CENTROIDS, rows)
+    rng = np.random.default_rng(seed)
+    sample = matrix[rng.choice(rows, min(rows, _PQ_TRAIN_ROWS), replace=False)]
+    centroids = np.stack([
+        _kmeans(sample[:, s * dsub:(s + 1) * dsub], k, rng) for s in range(nsub)
+    ]).astype(np.float32)
+    codes = np.empty((rows, nsub), dtype=np.uint8)
+    for start in range(0, rows, _ENCODE_CHUNK):
+        chunk = matrix[start:start + _ENCODE_CHUNK]
+        for s in range(nsub):
+            codes[start:start + len(chunk), s] = _nearest_centroids(chunk[:, s * dsub:(s + 1) * dsub], centroids[s])
+    return codes, centroids
+
+
+def export_fasttext_model(model_path, out_dir=None, cutoff=None, dsub=None):
+    # Writes the input (word + subword bucket) matrix as .npy files every worker can memory-map
+    # read-only, plus the vocabulary and subword settings needed to rebuild vectors. With cutoff
+    # only the most frequent words and the buckets their subwords use are kept; with dsub the
+    # rows are product quantized.
+    import fasttext
+
+    out_dir = out_dir or mmap_dir_for(model_path)
+    model = fasttext.load_model(model_path)
+    args = model.f.getArgs()
+    words = model.get_words(on_unicode_error='replace')
+    matrix = np.asarray(model.get_input_matrix(), dtype=np.float32)
+    nwords = len(words)
+
+    buckets = None
+    if cutoff and cutoff < nwords:
+        # fastText sorts its dictionary by frequency, so the head of the vocabulary is what we keep
+        words = words[:cutoff]
+        buckets = np.array(sorted({
+            h for word in words if word != _EOS
+            for h in subword_hashes(word, args.minn, args.maxn, args.bucket)
+        }), dtype=np.int64)
+        matrix = np.concatenate([matrix[:cutoff], matrix[nwords + buckets]])
+    matrix = np.ascontiguousarray(matrix)
+
+    # Build in a temporary directory and rename, so workers racing on first start never see a partial export
+    tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    if dsub:
+        codes, centroids = product_quantize(matrix, dsub)
+        np.save(os.path.join(tmp_dir, _CODES_FILE), codes)
+        np.save(os.path.join(tmp_dir, _CENTROIDS_FILE), centroids)
+    else:
+        np.save(os.path.join(tmp_dir, _MATRIX_FILE), matrix)
+    if buckets is not None:
+        np.save(os.path.join(tmp_dir, _BUCKETS_FILE), buckets)
+    with open(os.path.join(tmp_dir, _META_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "dim": int(args.dim),
+            "minn": int(args.minn),
+            "maxn": int(args.maxn),
+            "bucket": int(args.bucket),
+            "cutoff": cutoff,
+            "dsub": dsub,
+            "source": _source_signature(model_path),
+            "words": words,
+        }, f, ensure_ascii=False)
+    try:
+        os.rename(tmp_dir, out_dir)
+    except OSError:
+        # Another worker finished its export first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    logger.info(f"Exported FastText input matrix {matrix.shape} to {out_dir} (cutoff={cutoff}, dsub={dsub})")
+    return out_dir
+
+
+class MmapFastTextModel:
+    # Read-only stand-in for a loaded fastText model that serves get_sentence_vector from a
+    # memory-mapped input matrix; the OS shares those pages between all worker processes
+    def __init__(self, mmap_dir):
+        with open(os.path.join(mmap_dir, _META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.minn = meta["minn"]
+        self.maxn = meta["maxn"]
+        self.bucket = meta["bucket"]
+        self.word_ids = {word: i for i, word in enumerate(meta["words"])}
+        self.nwords = len(meta["words"])
+        self.quantized = bool(meta.get("dsub"))
+        # Distinguishes vectors of compressed exports from the full model's, e.g. in the embedding cache
+        self.variant = f"cutoff{meta.get('cutoff')}-dsub{meta.get('dsub')}" if meta.get("cutoff") or meta.get("dsub") else None
+        if self.quantized:
+            self.codes = np.load(os.path.join(mmap_dir, _CODES_FILE), mmap_mode="r")
+            self.centroids = np.load(os.path.join(mmap_dir, _CENTROIDS_FILE))
+        else:
+            self.matrix = np.load(os.path.join(mmap_dir, _MATRIX_FILE), mmap_mode="r")
+        buckets_path = os.path.join(mmap_dir, _BUCKETS_FILE)
+        self.buckets = np.load(buckets_path) if os.path.exists(buckets_path) else None
+        self._subword_ids = lru_cache(maxsize=int(os.getenv("FASTTEXT_MMAP_WORD_CACHE", 100000)))(self._compute_subword_ids)
+
+    def get_dimension(self):
+        return self.dim
+
+    def _bucket_rows(self, hashes):
+        if self.buckets is None:
+            return [self.nwords + h for h in hashes]
+        # Pruned models only keep the buckets used by their vocabulary; other n-grams contribute nothing
+        positions = np.searchsorted(self.buckets, hashes)
+        return [
+            self.nwords + int(p) for h, p in zip(hashes, positions)
+            if p < len(self.buckets) and self.buckets[p] == h
+        ]
+
+    def _compute_subword_ids(self, word):
+        word_id = self.word_ids.get(word)
+        ids = [word_id] if word_id is not None else []
+        if word != _EOS:
+            ids.extend(self._bucket_rows(subword_hashes(word, self.minn, self.maxn, self.bucket)))
+        return ids
+
+    def _rows(self, ids):
+        if not self.quantized:
+            return self.matrix[ids]
+        codes = self.codes[ids]
+        return self.centroids[np.arange(codes.shape[1]), codes].reshape(len(ids), self.dim)
+
+    def get_word_vector(self, word):
+        ids = self._subword_ids(word)
+        if not ids:
+            return np.zeros(self.dim, dtype=np.float32)
+        return self._rows(ids).mean(axis=0, dtype=np.float32)
+
+    def get_sentence_vector(self, text):
+        if "\n" in text:
+            raise ValueError("get_sentence_vector processes one line at a time (remove '\\n')")
+        # Same as FastText::getSentenceVector for unsupervised models: average of unit-norm word vectors
+        sentence = np.zeros(self.dim, dtype=np.float32)
+        count = 0
+        for token in text.encode("utf-8").split():
+            vector = self.get_word_vector(token.decode("utf-8", errors="replace"))
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                sentence += vector / norm
+                count += 1
+        if count > 0:
+            sentence /= count
+        return sentence
+
+
+def _export_is_current(model_path, out_dir, cutoff=None, dsub=None, check_settings=True):
+    try:
+        with open(os.path.join(out_dir, _META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if meta.get("source") != _source_signature(model_path):
+        return False
+    return not check_settings or (meta.get("cutoff") == cutoff and meta.get("dsub") == dsub)
+
+
+def _load_export(model_path, out_dir, cutoff=None, dsub=None, check_settings=True):
+    if not _export_is_current(model_path, out_dir, cutoff, dsub, check_settings):
+        if os.path.exists(out_dir):
+            logger.info(f"FastText model {model_path} or its export settings changed, re-exporting {out_dir}")
+            shutil.rmtree(out_dir, ignore_errors=True)
+        export_fasttext_model(model_path, out_dir, cutoff, dsub)
+    return MmapFastTextModel(out_dir)
+
+
+def load_mmap_model(model_path):
+    return _load_export(model_path, mmap_dir_for(model_path))
+
+
+def quantize_settings(config=None):
+    # Trainer config `quantize:` block first, then FASTTEXT_QUANTIZE_* for services without a config
+    settings = (config or {}).get("quantize") or {}
+    cutoff = settings.get("cutoff", os.getenv("FASTTEXT_QUANTIZE_CUTOFF"))
+    dsub = settings.get("dsub", os.getenv("FASTTEXT_QUANTIZE_DSUB", 2))
+    return (int(cutoff) if cutoff else None), (int(dsub) if dsub else None)
+
+
+def load_quantized_model(model_path, config=None):
+    # Without a trainer config (serving) any up-to-date export is used as is, so the API never
+    # re-quantizes away the model the collection was ingested with
+    cutoff, dsub = quantize_settings(config)
+    return _load_export(model_path, quantized_dir_for(model_path), cutoff, dsub, check_settings=config is not None)
+
+
+def quantized_enabled():
+    return os.getenv("FASTTEXT_QUANTIZED", "false").lower() in ("1", "true", "yes")
@@ -0,0 +1,119 @@
+import os
+import time
+import random
+import shutil
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import fasttext
+import mlflow
+import yaml
+from .hashing import content_hash
+from .paths import state_path, atomic_write
+from .fasttext_eval import evaluate_retrieval, retrieval_pairs
+
+logger = logging.getLogger(__name__)
+
+# Only these keys are passed to fasttext.train_unsupervised; the rest of a config (quantize) is ours
+TRAIN_PARAMS = ("model", "dim", "epoch", "lr", "wordNgrams", "minn", "maxn", "thread")
+SWEEP_METRICS = ("mrr", "recall_at_k")
+
+
+def load_search_space(path):
+    # base: config the trials start from (relative to the sweep file); space: parameter -> values
+    with open(path, 'r') as file:
+        sweep = yaml.safe_load(file)
+    if not sweep.get('space'):
+        raise ValueError(f"Sweep file {path} has no search space")
+    base = sweep.get('base') or {}
+    if isinstance(base, str):
+        with open(os.path.join(os.path.dirname(os.path.abspath(path)), base), 'r') as file:
+            base = yaml.safe_load(file)
+    sweep['base'] = base
+    return sweep
+
+
+def expand_trials(base, space, trials=None, seed=0):
+    # Full grid, or a seeded random sample of it when trials is smaller than the grid
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if trials and trials < len(grid):
+        grid = random.Random(seed).sample(grid, trials)
+    return [{**base, **values} for values in grid]
+
+
+def write_corpus(texts):
+    # One training file shared by every trial (and by later sweeps over the same texts)
+    texts = list(texts)
+    path = state_path(f"fasttext_corpus_{content_hash(texts)[:16]}.txt")
+    if not os.path.exists(path):
+        with atomic_write(path, encoding='utf-8') as f:
+            for text in texts:
+                f.write(f"{text}\n")
+    return path
+
+
+def _run_trial(trial_id, config, corpus_path, pairs, out_dir, k):
+    # Runs in a worker process: trains on the shared corpus, scores and saves the model
+    start = time.perf_counter()
+    model = fasttext.train_unsupervised(corpus_path, **{key: config[key] for key in TRAIN_PARAMS if key in config})
+    train_seconds = time.perf_counter() - start
+    metrics = evaluate_retrieval(model, pairs, ks=sorted({1, 5, k}))
+    metrics['train_seconds'] = train_seconds
+    model_path = os.path.join(out_dir, f"trial_{trial_id}.bin")
+    model.save_model(model_path)
+    return trial_id, model_path, metrics
+
+
+def promote(trial_model_path, model_path):
+    # Atomic, so the API and ingestion never load a partially copied model
+    with open(trial_model_path, 'rb') as source, atomic_write(model_path, 'wb') as f:
+        shutil.copyfileobj(source, f)
+
+
+def run_sweep(sweep, texts, model_path, workers=None, metric="mrr", k=10, pairs=None):
+    if metric not in SWEEP_METRICS:
+        raise ValueError(f"Unsupported sweep metric: {metric}")
+    score_key = metric if metric == "mrr" else f"recall_at_{k}"
+    configs = expand_trials(sweep['base'], sweep['space'], sweep.get('trials'), sweep.get('seed', 0))
+    thread = int(sweep.get('thread') or sweep['base'].get('thread') or 1)
+    configs = [{**config, 'thread': thread} for config in configs]
+    # fastText already trains with `thread` threads, so the pool only fills the remaining cores
+    workers = workers or max(1, (os.cpu_count() or 1) // thread)
+    corpus_path = write_corpus(texts)
+    pairs = pairs if pairs is not None else retrieval_pairs()
+    out_dir = state_path(f"fasttext_sweep_{time.strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(out_dir, exist_ok=True)
+    logger.info(f"FastText sweep: {len(configs)} trials, {workers} in parallel x {thread} threads, {len(pairs)} queries")
+
+    mlflow.set_experiment("FastText Training - Spanish")
+    results = []
+    try:
+        with mlflow.start_run(run_name="fasttext_sweep"):
+            mlflow.log_params({'trials': len(configs), 'workers': workers, 'metric': metric, 'k': k, 'queries': len(pairs)})
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(_run_trial, trial_id, config, corpus_path, pairs, out_dir, k): config
+                    for trial_id, config in enumerate(configs)
+                }
+                for future in as_completed(futures):
+                    config = futures[future]
+                    trial_id, trial_model_path, metrics = future.result()
+                    with mlflow.start_run(run_name=f"trial_{trial_id}", nested=True):
+                        mlflow.log_params(config)
+                        mlflow.log_metrics(metrics)
+                    logger.info(f"Trial {trial_id}: {metrics}")
+                    results.append({'trial': trial_id, 'config': config, 'model_path': trial_model_path, **metrics})
+
+            best = max(results, key=lambda result: (result[score_key], result['mrr']))
+            promote(best['model_path'], model_path)
+            mlflow.log_params({f"best_{key}": value for key, value in best['config'].items()})
+            mlflow.log_metrics({f"best_{key}": best[key] for key in ('mrr', f'recall_at_{k}', 'train_seconds')})
+            mlflow.log_artifact(model_path, "model")
+            logger.info(f"Promoted trial {best['trial']} to {model_path}")
+    finally:
+        # Only the promoted model is kept
+        shutil.rmtree(out_dir, ignore_errors=True)
+    for result in results:
+        del result['model_path']
+    return sorted(results, key=lambda result: result['trial']), best
@@ -0,0 +1,13 @@
+import hashlib
+import json
+
+
+def content_hash(*parts):
+    # Stable digest over text and JSON-serializable metadata, used to detect changed articles
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, ensure_ascii=False, default=str)
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
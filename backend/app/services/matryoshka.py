@@ -0,0 +1,47 @@
+import os
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+# text-embedding-3 models are trained so that a prefix of the vector, re-normalized, is itself a
+# usable embedding; this is what the API's `dimensions` parameter returns
+LARGE_MODEL = "text-embedding-3-large"
+
+
+def large_dimensions():
+    # 0 keeps the full 3072 dimensions
+    return int(os.getenv("OPENAI_LARGE_DIMENSIONS", 0))
+
+
+def large_collection():
+    # Full-width text-embedding-3-large collection (or alias); reduced ones are named after it
+    return os.getenv("OPENAI_LARGE_COLLECTION", "articles_openai")
+
+
+def reduced_collection_name(collection_name, dimensions):
+    return f"{collection_name}_{dimensions}" if dimensions else collection_name
+
+
+def truncate_vector(vector, dimensions):
+    short = np.asarray(vector[:dimensions], dtype=np.float32)
+    norm = np.linalg.norm(short)
+    return (short / norm if norm else short).tolist()
+
+
+def cosine_scores(matrix, query):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    query = np.asarray(query, dtype=np.float32)
+    return matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+
+
+class MatryoshkaEmbeddings(Embeddings):
+    # Truncates the wrapped model's vectors, so the embedding cache keeps full-width vectors
+    # and the short and full collections share one API call per text
+    def __init__(self, embeddings, dimensions):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts):
+        return [truncate_vector(vector, self.dimensions) for vector in self.embeddings.embed_documents(texts)]
+
+    def embed_query(self, text):
+        return truncate_vector(self.embeddings.embed_query(text), self.dimensions)
@@ -0,0 +1,168 @@
+import os
+import time
+import asyncio
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+
+# Minimal Prometheus text-format metrics. With METRICS=false every helper returns before taking
+# a lock or reading the clock, and Qdrant clients are not wrapped at all.
+_ENABLED = os.getenv("METRICS", "true").lower() not in ("0", "false", "no")
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_NOOP = nullcontext()
+
+
+def metrics_enabled():
+    return _ENABLED
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum, max]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-2] += value
+            series[-1] = max(series[-1], value)
+
+    def summary(self):
+        with self._lock:
+            return {
+                labels: {"count": sum(series[:-2]), "total_seconds": series[-2], "max_seconds": series[-1]}
+                for labels, series in self._series.items()
+            }
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-2]):
+                    cumulative += count
+                    names = self.labelnames + ("le",)
+                    lines.append(f"{self.name}_bucket{_label_text(names, labels + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in each stage of an operation", ("operation", "stage"))
+CALLS = Counter("upstream_calls_total", "Calls to Qdrant, embedding models and the LLM", ("service", "method"))
+CACHE_EVENTS = Counter("cache_events_total", "Cache lookups by outcome", ("cache", "outcome"))
+_METRICS = (STAGE_SECONDS, CALLS, CACHE_EVENTS)
+
+
+def observe(operation, stage, seconds):
+    if _ENABLED:
+        STAGE_SECONDS.observe(operation, stage, value=seconds)
+
+
+@contextmanager
+def _timed(operation, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(operation, stage, value=time.perf_counter() - start)
+
+
+def timed(operation, stage):
+    return _timed(operation, stage) if _ENABLED else _NOOP
+
+
+def count_call(service, method, amount=1):
+    if _ENABLED and amount:
+        CALLS.inc(service, method, amount=amount)
+
+
+def count_cache(cache, outcome, amount=1):
+    if _ENABLED and amount:
+        CACHE_EVENTS.inc(cache, outcome, amount=amount)
+
+
+def stage_summary(operation):
+    return {
+        stage: {**values, "avg_ms": values["total_seconds"] / values["count"] * 1000 if values["count"] else 0.0}
+        for (op, stage), values in STAGE_SECONDS.summary().items() if op == operation
+    }
+
+
+def instrument_client(client, service="qdrant"):
+    # Counts and times every client method call; sync and async clients alike
+    return _InstrumentedClient(client, service) if _ENABLED else client
+
+
+class _InstrumentedClient:
+    def __init__(self, client, service):
+        self._client = client
+        self._service = service
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        if asyncio.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            async def async_call(*args, **kwargs):
+                count_call(self._service, name)
+                with _timed(self._service, name):
+                    return await attr(*args, **kwargs)
+            return async_call
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            count_call(self._service, name)
+            with _timed(self._service, name):
+                return attr(*args, **kwargs)
+        return call
+
+
+def render(gauges=None):
+    # gauges: {name: value} sampled at scrape time, e.g. cache sizes
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for name, value in sorted((gauges or {}).items()):
+        lines.extend([f"# TYPE {name} gauge", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,46 @@
+import os
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def state_path(filename):
+    # Side files (caches, indexes) live in a directory next to the Qdrant storage, not inside it
+    state_dir = os.getenv("STATE_DIR") or os.getenv("VECTOR_DB_PATH", "./vector_db").rstrip("/\\") + "_state"
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, filename)
+
+
+@contextmanager
+def atomic_write(path, mode="w", encoding=None):
+    # Written to a temporary file and renamed over `path` only if the block completes, so readers
+    # (other workers included) never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ReloadingFile:
+    # Holds load(path) and calls it again only when the file's mtime changes; default while it is missing
+    def __init__(self, path, load, default=None):
+        self.path = path
+        self._load = load
+        self._default = default
+        self._mtime = None
+        self._value = None
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return self._default
+        if mtime != self._mtime:
+            self._value = self._load(self.path)
+            self._mtime = mtime
+        return self._value
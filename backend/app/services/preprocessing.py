@@ -0,0 +1,89 @@
+import os
+import re
+import html
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Single-pass HTML to text shared by ingestion, FastText training and analysis. Matches
+# BeautifulSoup(html, 'html.parser').get_text() for our exports: comments, script/style
+# bodies and tags are dropped, entities decoded, and text nodes joined without a separator.
+# A `<` with no closing `>` (or an unclosed comment) is kept as text, as html.parser does.
+_SKIP_RE = re.compile(r'<!--.*?-->|<(script|style)\b[^>]*>.*?(?:</\1\s*>|$)', re.IGNORECASE | re.DOTALL)
+_CDATA_RE = re.compile(r'<!\[CDATA\[(.*?)\]\]>', re.DOTALL)
+_TAG_RE = re.compile(r'<[a-zA-Z/!?](?:"[^"]*"|\'[^\']*\'|[^\'">])*>')
+# Excel escapes the carriage returns of the export as _x000d_
+_X000D_RE = re.compile(r'_x000d_', re.IGNORECASE)
+_NON_TEXT_RE = re.compile(r'[^a-zA-Z0-9\s.,!?]')
+_NON_TEXT_ACCENT_RE = re.compile(r'[^a-zA-Z0-9áéíóúÁÉÍÓÚüÜñÑ\s.,!?]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_MEMO_SIZE = int(os.getenv("PREPROCESS_CACHE_SIZE", 200000))
+# Below this many uncached texts a process pool costs more than it saves
+_PARALLEL_MIN = int(os.getenv("PREPROCESS_PARALLEL_MIN", 20000))
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _markup_to_text(markup):
+    text = _TAG_RE.sub('', markup)
+    return html.unescape(text) if '&' in text else text
+
+
+def html_to_text(html_content):
+    text = _SKIP_RE.sub('', html_content)
+    if '<![CDATA[' not in text:
+        return _markup_to_text(text)
+    # CDATA content is literal text; only the parts around it hold tags and entities
+    parts = _CDATA_RE.split(text)
+    return ''.join(part if i % 2 else _markup_to_text(part) for i, part in enumerate(parts))
+
+
+def _preprocess(html_content, keep_accent=False):
+    text = _X000D_RE.sub(' ', html_to_text(html_content))
+    text = (_NON_TEXT_ACCENT_RE if keep_accent else _NON_TEXT_RE).sub(' ', text)
+    return _WHITESPACE_RE.sub(' ', text.lower()).strip()
+
+
+def _preprocess_chunk(args):
+    texts, keep_accent = args
+    return [_preprocess(text, keep_accent) for text in texts]
+
+
+def preprocess_html(html_content, keep_accent=False):
+    # Memoized by content: the same article is preprocessed once per process however many stages read it
+    key = (keep_accent, html_content)
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    text = _preprocess(html_content, keep_accent)
+    _remember([(key, text)])
+    return text
+
+
+def _remember(items):
+    with _memo_lock:
+        for key, text in items:
+            _memo[key] = text
+            _memo.move_to_end(key)
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+
+
+def preprocess_many(html_contents, keep_accent=False, workers=1):
+    # Preprocesses each distinct uncached text once, over a process pool when there are enough of them
+    with _memo_lock:
+        done = {text: _memo[(keep_accent, text)] for text in set(html_contents) if (keep_accent, text) in _memo}
+    missing = [text for text in dict.fromkeys(html_contents) if text not in done]
+    if missing:
+        if workers > 1 and len(missing) >= _PARALLEL_MIN:
+            size = max(1, len(missing) // (workers * 4))
+            chunks = [(missing[i:i + size], keep_accent) for i in range(0, len(missing), size)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = [text for chunk in executor.map(_preprocess_chunk, chunks) for text in chunk]
+        else:
+            results = _preprocess_chunk((missing, keep_accent))
+        done.update(zip(missing, results))
+        _remember(((keep_accent, text), done[text]) for text in missing)
+    return [done[text] for text in html_contents]
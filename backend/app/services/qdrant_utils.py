@@ -0,0 +1,8 @@
+def scroll_points(client, collection_name, batch_size=256, with_payload=True, with_vectors=True):
+    # Pages through every point of a collection
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name, limit=batch_size, offset=offset, with_payload=with_payload, with_vectors=with_vectors)
+        yield from points
+        if offset is None:
+            break
@@ -0,0 +1,23 @@
+import os
+import resource
+
+
+def current_rss_bytes():
+    # Current resident set size; /proc is Linux only, elsewhere fall back to the peak RSS
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_pss_bytes():
+    # Proportional set size splits shared pages (e.g. a memory-mapped model) between the processes using them
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
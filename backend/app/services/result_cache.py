@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from .paths import state_path, atomic_write, ReloadingFile
+
+logger = logging.getLogger(__name__)
+
+_VERSIONS_FILE = "collection_versions.json"
+
+
+def bump_collection_version(*collection_names):
+    # Called by ingestion whenever a collection's contents change so searchers drop stale results
+    path = state_path(_VERSIONS_FILE)
+    versions = _read_versions(path)
+    for name in collection_names:
+        versions[name] = time.time_ns()
+    with atomic_write(path) as f:
+        json.dump(versions, f)
+
+
+def _read_versions(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+class CollectionVersions:
+    # Reads the version file written by ingestion, re-parsing it only when its mtime changes
+    def __init__(self, path=None):
+        self._file = ReloadingFile(path or state_path(_VERSIONS_FILE), _read_versions, default={})
+
+    def get(self, collection_name):
+        return self._file.get().get(collection_name, 0)
+
+
+class ResultCache:
+    # LRU + TTL cache of search results; each entry remembers how long it took to compute
+    def __init__(self, max_items=None, ttl_seconds=None):
+        self.max_items = int(max_items or os.getenv("RESULT_CACHE_SIZE", 1000))
+        self.ttl_seconds = float(ttl_seconds or os.getenv("RESULT_CACHE_TTL", 300))
+        self.versions = CollectionVersions()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    def _full_key(self, collection_name, key):
+        return (collection_name, self.versions.get(collection_name)) + tuple(key)
+
+    def get(self, collection_name, key):
+        full_key = self._full_key(collection_name, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            results, compute_seconds, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[full_key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            self.saved_seconds += compute_seconds
+            return list(results)
+
+    def put(self, collection_name, key, results, compute_seconds):
+        full_key = self._full_key(collection_name, key)
+        with self._lock:
+            # Entries from older collection versions can never be hit again
+            stale = [k for k in self._entries if k[0] == collection_name and k[1] != full_key[1]]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+            self._entries[full_key] = (list(results), compute_seconds, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "items": len(self._entries),
+            "saved_seconds": self.saved_seconds,
+        }
+
+
+def result_cache_enabled():
+    return os.getenv("RESULT_CACHE", "true").lower() not in ("0", "false", "no")
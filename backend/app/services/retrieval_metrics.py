@@ -0,0 +1,27 @@
+import math
+
+# Binary relevance metrics over a ranked list of article ids; `relevant` is a set of ids
+
+
+def recall_at_k(ranked, relevant, k):
+    if not relevant:
+        return 1.0
+    return len(relevant & set(ranked[:k])) / len(relevant)
+
+
+def reciprocal_rank(ranked, relevant):
+    for rank, doc_id in enumerate(ranked, start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(ranked, relevant, k):
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, doc_id in enumerate(ranked[:k], start=1) if doc_id in relevant)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(relevant), k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -1,102 +1,269 @@
 import os
+import asyncio
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient, models
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
 from qdrant_client.models import Filter, FieldCondition, MatchValue
-import numpy as np
 import logging
+import time
+import threading
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
 from langchain.chat_models import ChatOpenAI
 from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.vectorstores import Qdrant
-from langchain.llms import OpenAI
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 import fasttext
 from langchain_core.messages import HumanMessage
+from .embedding_cache import with_embedding_cache, get_embedding_cache, normalize_text
+from .result_cache import ResultCache, result_cache_enabled
+from .resources import current_rss_bytes
+from .fasttext_mmap import load_mmap_model, load_quantized_model, quantized_enabled
+from .facet_index import FacetIndex, build_facets
+from .bm25_index import PersistedBM25Index, reciprocal_rank_fusion
+from .chunking import ChunkingConfig
+from .verdict_cache import get_verdict_cache, verdict_cache_enabled
+from .metrics import timed, observe, count_call, count_cache, instrument_client
+from .matryoshka import large_collection, large_dimensions, reduced_collection_name, truncate_vector, cosine_scores
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+AI_VALIDATION_MODES = ("concurrent", "batched")
+HYBRID = "hybrid"
+
+# Built once at import; only the context and question change per request
+RAG_PROMPT = PromptTemplate(
+    template="""Use the following pieces of context to answer the question at the end.
+If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+{context}
+
+Question: {question}
+Answer:""",
+    input_variables=["context", "question"],
+)
+
 class FastTextEmbeddings:
     def __init__(self, model_path):
+        self.model_path = model_path
         try:
-            self.model = fasttext.load_model(model_path)
+            # FASTTEXT_QUANTIZED serves the pruned/product-quantized export, FASTTEXT_MMAP the
+            # full one; both share one read-only copy of the matrix between all workers
+            if quantized_enabled():
+                self.model = load_quantized_model(model_path)
+            elif os.getenv("FASTTEXT_MMAP", "false").lower() in ("1", "true", "yes"):
+                self.model = load_mmap_model(model_path)
+            else:
+                self.model = fasttext.load_model(model_path)
         except Exception as e:
             logger.error(f"Failed to load FastText model from {model_path}: {str(e)}")
             raise ValueError(f"Failed to load FastText model: {str(e)}")
 
+    def embed_documents(self, texts):
+        return [self.model.get_sentence_vector(text).tolist() for text in texts]
+
     def embed_query(self, text):
         return self.model.get_sentence_vector(text).tolist()
 
+    async def aembed_query(self, text):
+        return await asyncio.to_thread(self.embed_query, text)
+
 class SearchService:
     def __init__(self):
         logger.info("Initializing SearchService")
-        self.client = QdrantClient(path=os.getenv("VECTOR_DB_PATH"))
-        
-        # Initialize OpenAI embeddings
-        self.openai_embeddings = OpenAIEmbeddings(
-            openai_api_key=os.getenv("OPENAI_API_KEY")
-        )
+        qdrant_url = os.getenv("QDRANT_URL")
+        self.client = instrument_client(QdrantClient(url=qdrant_url) if qdrant_url else QdrantClient(path=os.getenv("VECTOR_DB_PATH")))
+        # Embedded (path) storage is in-process, so only a Qdrant server gets a true async client
+        self.async_client = instrument_client(AsyncQdrantClient(url=qdrant_url)) if qdrant_url else None
         
-        # Initialize OpenAI large embeddings
-        self.openai_large_embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-large",
-            openai_api_key=os.getenv("OPENAI_API_KEY")
-        )
-        
-        # Initialize FastText embeddings
-        fasttext_model_path = os.getenv("FASTTEXT_MODEL_PATH")
-        if not fasttext_model_path:
-            raise ValueError("FASTTEXT_MODEL_PATH must be set for FastText embeddings")
-        self.fasttext_embeddings = FastTextEmbeddings(fasttext_model_path)
-        
-        # Initialize ChatOpenAI LLM
-        self.llm = ChatOpenAI(
-            model_name=os.getenv("OPENAI_LLM_MODEL", "gpt-4-turbo-preview"),
-            temperature=0,
-            openai_api_key=os.getenv("OPENAI_API_KEY")
+        # Backends are built on first use (or at startup via PRELOAD_BACKENDS) so a worker only
+        # pays for the embedding types it actually serves
+        self._backend_factories = {
+            "openai": lambda: with_embedding_cache(OpenAIEmbeddings(
+                openai_api_key=os.getenv("OPENAI_API_KEY")
+            )),
+            "openai-large": lambda: with_embedding_cache(OpenAIEmbeddings(
+                model="text-embedding-3-large",
+                openai_api_key=os.getenv("OPENAI_API_KEY")
+            )),
+            "fasttext": self._load_fasttext,
+            "llm": lambda: ChatOpenAI(
+                model_name=os.getenv("OPENAI_LLM_MODEL", "gpt-4-turbo-preview"),
+                temperature=0,
+                openai_api_key=os.getenv("OPENAI_API_KEY")
+            ),
+        }
+        self._backends = {}
+        self._backend_stats = {}
+        self._backend_lock = threading.Lock()
+
+        self.result_cache = ResultCache() if result_cache_enabled() else None
+
+        self.search_timeout = float(os.getenv("SEARCH_TIMEOUT", 10))
+        self.llm_timeout = float(os.getenv("LLM_TIMEOUT", 30))
+        self.max_concurrent_calls = int(os.getenv("MAX_CONCURRENT_CALLS", 32))
+        self._semaphore = None
+        self.validation_fanout = int(os.getenv("AI_VALIDATION_FANOUT", 8))
+        self.verdict_cache = get_verdict_cache() if verdict_cache_enabled() else None
+        self.facet_indexes = {}
+        self.bm25_indexes = {}
+        # Must match the CHUNK_* settings the collections were ingested with
+        self.chunking = ChunkingConfig()
+        # Only takes effect on quantized collections: candidates come from the quantized index,
+        # oversampled, then rescored with the original vectors
+        self.quantization_params = models.QuantizationSearchParams(
+            rescore=os.getenv("QUANTIZATION_RESCORE", "true").lower() in ("1", "true", "yes"),
+            oversampling=float(os.getenv("QUANTIZATION_OVERSAMPLING", 2.0))
         )
+        self.hybrid_vector_type = os.getenv("HYBRID_VECTOR_TYPE", "openai")
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", 50))
+        self.hybrid_vector_weight = float(os.getenv("HYBRID_VECTOR_WEIGHT", 1.0))
+        self.hybrid_lexical_weight = float(os.getenv("HYBRID_LEXICAL_WEIGHT", 1.0))
+        self.hybrid_rrf_k = int(os.getenv("HYBRID_RRF_K", 60))
+        self.rag_top_k = int(os.getenv("RAG_TOP_K", 4))
+        self.rag_context_chars = int(os.getenv("RAG_CONTEXT_CHARS", 2000))
+        # With OPENAI_LARGE_DIMENSIONS set, openai-large searches the reduced collection and reranks
+        # the top OPENAI_LARGE_RERANK candidates with the full-width vectors of OPENAI_LARGE_COLLECTION
+        self.large_collection = large_collection()
+        self.large_dimensions = large_dimensions()
+        self.large_rerank = int(os.getenv("OPENAI_LARGE_RERANK", 50)) if self.large_dimensions else 0
 
     def _get_collection_name(self, embedding_type: str):
         if embedding_type == "openai":
             return "articles"
         elif embedding_type == "openai-large":
-            return "articles_openai"
+            return reduced_collection_name(self.large_collection, self.large_dimensions)
         elif embedding_type == "fasttext":
             return "articles_fasttext"
+        elif embedding_type == HYBRID:
+            # Hybrid search fuses BM25 with the vectors of HYBRID_VECTOR_TYPE's collection
+            return self._get_collection_name(self.hybrid_vector_type)
         else:
             raise ValueError(f"Unsupported embedding type: {embedding_type}")
 
-    def _get_embeddings(self, embedding_type: str):
-        if embedding_type == "openai":
-            return self.openai_embeddings
-        elif embedding_type == "openai-large":
-            return self.openai_large_embeddings
-        elif embedding_type == "fasttext":
-            return self.fasttext_embeddings
-        else:
+    @staticmethod
+    def _load_fasttext():
+        fasttext_model_path = os.getenv("FASTTEXT_MODEL_PATH")
+        if not fasttext_model_path:
+            raise ValueError("FASTTEXT_MODEL_PATH must be set for FastText embeddings")
+        return with_embedding_cache(FastTextEmbeddings(fasttext_model_path))
+
+    def _get_backend(self, name: str):
+        backend = self._backends.get(name)
+        if backend is not None:
+            return backend
+        if name not in self._backend_factories:
+            raise ValueError(f"Unsupported embedding type: {name}")
+        with self._backend_lock:
+            if name not in self._backends:
+                rss_before = current_rss_bytes()
+                start = time.perf_counter()
+                self._backends[name] = self._backend_factories[name]()
+                self._backend_stats[name] = {
+                    "load_seconds": time.perf_counter() - start,
+                    "rss_delta_mb": (current_rss_bytes() - rss_before) / (1024 * 1024),
+                }
+                logger.info(f"Loaded backend {name} in {self._backend_stats[name]['load_seconds']:.2f}s "
+                            f"(+{self._backend_stats[name]['rss_delta_mb']:.1f} MB RSS)")
+        return self._backends[name]
+
+    async def _aget_backend(self, name: str):
+        # Loading can take seconds (a fastText model), so it happens off the event loop
+        backend = self._backends.get(name)
+        if backend is not None:
+            return backend
+        return await asyncio.to_thread(self._get_backend, name)
+
+    def preload(self, names=None):
+        if names is None:
+            names = [name.strip() for name in os.getenv("PRELOAD_BACKENDS", "").split(",") if name.strip()]
+        for name in names:
+            self._get_backend(name)
+
+    def get_backend_stats(self):
+        return {
+            "rss_mb": current_rss_bytes() / (1024 * 1024),
+            "backends": {
+                name: {"loaded": name in self._backends, **self._backend_stats.get(name, {})}
+                for name in self._backend_factories
+            },
+        }
+
+    @property
+    def llm(self):
+        return self._get_backend("llm")
+
+    def _embedding_backend_name(self, embedding_type: str):
+        if embedding_type == HYBRID:
+            embedding_type = self.hybrid_vector_type
+        if embedding_type == "llm":
             raise ValueError(f"Unsupported embedding type: {embedding_type}")
+        return embedding_type
 
-    def search(self, query: str, category: str = None, limit: int = 15, embedding_type: str = "openai", threshold: float = 0):
-        logger.info(f"Performing search - query: {query}, category: {category}, limit: {limit}, embedding_type: {embedding_type}, threshold: {threshold}")
+    def _get_embeddings(self, embedding_type: str):
+        return self._get_backend(self._embedding_backend_name(embedding_type))
+
+    async def _aget_embeddings(self, embedding_type: str):
+        return await self._aget_backend(self._embedding_backend_name(embedding_type))
+
+    def get_cache_stats(self):
+        stats = {"embeddings": get_embedding_cache().stats()}
+        if self.result_cache:
+            stats["results"] = self.result_cache.stats()
+        if self.verdict_cache:
+            stats["verdicts"] = self.verdict_cache.stats()
+        return stats
+
+    def _is_reduced(self, embedding_type):
+        if embedding_type == HYBRID:
+            embedding_type = self.hybrid_vector_type
+        return embedding_type == "openai-large" and bool(self.large_dimensions)
+
+    def _query_vectors(self, embedding_type, query_vector):
+        # Returns (vector to search with, full-width vector to rerank with or None)
+        if not self._is_reduced(embedding_type):
+            return query_vector, None
+        return truncate_vector(query_vector, self.large_dimensions), query_vector if self.large_rerank else None
+
+    def _prepare_search(self, query, category, limit, embedding_type, threshold):
         collection_name = self._get_collection_name(embedding_type)
-        embeddings = self._get_embeddings(embedding_type)
-        
+        reranked = self._is_reduced(embedding_type) and self.large_rerank > 0
+        fetch = limit
+        if embedding_type == HYBRID:
+            # Hybrid search fuses a deeper vector candidate list with the lexical one
+            fetch = max(fetch, self.hybrid_candidates)
+        if reranked:
+            fetch = max(fetch, self.large_rerank)
+        hnsw_ef = int(os.getenv("HNSW_EF", 128))
+        cache_key = (normalize_text(query), category, limit, embedding_type, threshold, hnsw_ef)
         filter_conditions = []
         if category:
             filter_conditions.append(
-                FieldCondition(key="grupo", match=MatchValue(value=int(category)))
+                FieldCondition(key="metadata.grupo", match=MatchValue(value=int(category)))
             )
-        
-        query_vector = embeddings.embed_query(query)
-        search_result = self.client.search(
+        # The category filter is applied inside HNSW traversal (backed by the payload index) and the
+        # threshold is pushed down as score_threshold, so Qdrant returns exactly `limit` qualifying hits
+        search_kwargs = dict(
             collection_name=collection_name,
-            query_vector=query_vector,
             query_filter=Filter(must=filter_conditions) if filter_conditions else None,
-            limit=limit * 2,  # Increase the limit to account for filtering
-            search_params=models.SearchParams(hnsw_ef=int(os.getenv("HNSW_EF", 128)), exact=False),
+            limit=fetch,
+            # Short-vector scores are not comparable to the threshold; it applies after reranking
+            score_threshold=threshold if threshold and not reranked else None,
+            search_params=models.SearchParams(hnsw_ef=hnsw_ef, exact=False, quantization=self.quantization_params),
         )
-        
+        return collection_name, cache_key, search_kwargs
+
+    def _get_cached_results(self, collection_name, cache_key):
+        if not self.result_cache:
+            return None
+        cached = self.result_cache.get(collection_name, cache_key)
+        count_cache("result", "miss" if cached is None else "hit")
+        if cached is not None:
+            logger.info(f"Search served from result cache, returning {len(cached)} results")
+        return cached
+
+    def _finish_search(self, search_result, collection_name, cache_key, limit, threshold, start):
         # Filter results based on the threshold
         filtered_results = [result for result in search_result if result.score >= threshold]
         
@@ -104,11 +271,256 @@ class SearchService:
         limited_results = filtered_results[:limit]
         
         logger.info(f"Search completed, found {len(search_result)} results, {len(filtered_results)} above threshold, returning {len(limited_results)}")
+        if self.result_cache:
+            self.result_cache.put(collection_name, cache_key, limited_results, time.perf_counter() - start)
         return limited_results
 
+    def _group_kwargs(self, search_kwargs):
+        # With chunked collections Qdrant groups chunk hits by their parent article, so `limit` counts articles
+        group_size = self.chunking.group_size if self.chunking.scoring == "sum" else 1
+        # Only chunk 0 (point id == article id) stores the full metadata; look it up per group in the same call
+        lookup = models.WithLookup(collection=search_kwargs["collection_name"], with_payload=["metadata"], with_vectors=False)
+        return dict(search_kwargs, group_by="article_id", group_size=group_size, with_lookup=lookup)
+
+    def _group_hits(self, groups):
+        points = []
+        for group in groups:
+            best = group.hits[0]
+            score = sum(hit.score for hit in group.hits) if self.chunking.scoring == "sum" else best.score
+            payload = dict(best.payload or {})
+            if group.lookup is not None and group.lookup.payload:
+                payload['metadata'] = group.lookup.payload.get('metadata', payload.get('metadata'))
+            points.append(models.ScoredPoint(id=group.id, version=best.version, score=score, payload=payload))
+        return sorted(points, key=lambda point: point.score, reverse=True)
+
+    @staticmethod
+    def _rescored(hits, points, full_vector):
+        # Second stage of reduced-dimension search: rescore the candidates with their full-width vectors
+        if points:
+            scores = dict(zip((point.id for point in points), cosine_scores([point.vector for point in points], full_vector).tolist()))
+            for hit in hits:
+                hit.score = scores.get(hit.id, hit.score)
+        return sorted(hits, key=lambda hit: hit.score, reverse=True)
+
+    def _full_vectors_kwargs(self, hits):
+        return dict(collection_name=self.large_collection, ids=list({hit.id for hit in hits}), with_payload=False, with_vectors=True)
+
+    def _rerank(self, hits, full_vector):
+        with timed("search", "rerank"):
+            points = self.client.retrieve(**self._full_vectors_kwargs(hits)) if hits else []
+            return self._rescored(hits, points, full_vector)
+
+    async def _arerank(self, hits, full_vector):
+        with timed("search", "rerank"):
+            points = await self._aqdrant("retrieve", **self._full_vectors_kwargs(hits)) if hits else []
+            return self._rescored(hits, points, full_vector)
+
+    def _vector_search(self, query_vector, search_kwargs, full_vector=None):
+        if not self.chunking.enabled:
+            hits = self.client.search(query_vector=query_vector, **search_kwargs)
+            return self._rerank(hits, full_vector) if full_vector is not None else hits
+        result = self.client.search_groups(query_vector=query_vector, **self._group_kwargs(search_kwargs))
+        if full_vector is not None:
+            # Chunks are rescored individually, then grouped back to articles
+            self._rerank([hit for group in result.groups for hit in group.hits], full_vector)
+            for group in result.groups:
+                group.hits.sort(key=lambda hit: hit.score, reverse=True)
+        return self._group_hits(result.groups)
+
+    async def _avector_search(self, query_vector, search_kwargs, full_vector=None):
+        if not self.chunking.enabled:
+            hits = await self._aqdrant("search", query_vector=query_vector, **search_kwargs)
+            return await self._arerank(hits, full_vector) if full_vector is not None else hits
+        result = await self._aqdrant("search_groups", query_vector=query_vector, **self._group_kwargs(search_kwargs))
+        if full_vector is not None:
+            await self._arerank([hit for group in result.groups for hit in group.hits], full_vector)
+            for group in result.groups:
+                group.hits.sort(key=lambda hit: hit.score, reverse=True)
+        return self._group_hits(result.groups)
+
+    def _get_bm25_index(self, collection_name):
+        if collection_name not in self.bm25_indexes:
+            self.bm25_indexes[collection_name] = PersistedBM25Index(collection_name)
+        return self.bm25_indexes[collection_name].get()
+
+    def _lexical_hits(self, collection_name, query, category):
+        index = self._get_bm25_index(collection_name)
+        if index is None:
+            logger.warning(f"No BM25 index for {collection_name}, hybrid search falls back to vectors only")
+            return []
+        return index.search(query, self.hybrid_candidates, grupo=int(category) if category else None)
+
+    def _fuse_rankings(self, vector_hits, lexical_hits, limit):
+        fused = reciprocal_rank_fusion(
+            [[hit.id for hit in vector_hits], [doc_id for doc_id, _ in lexical_hits]],
+            [self.hybrid_vector_weight, self.hybrid_lexical_weight],
+            k=self.hybrid_rrf_k
+        )
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    @staticmethod
+    def _fused_points(ranking, vector_hits, retrieved):
+        # Lexical-only hits have no ScoredPoint yet; their payloads come from a retrieve call
+        points = {hit.id: hit for hit in retrieved}
+        points.update((hit.id, hit) for hit in vector_hits)
+        return [
+            models.ScoredPoint(id=doc_id, version=getattr(points[doc_id], "version", 0) or 0, score=score, payload=points[doc_id].payload)
+            for doc_id, score in ranking if doc_id in points
+        ]
+
+    def _hybrid_search(self, collection_name, query, category, limit, vector_hits):
+        ranking = self._fuse_rankings(vector_hits, self._lexical_hits(collection_name, query, category), limit)
+        vector_ids = {hit.id for hit in vector_hits}
+        missing = [doc_id for doc_id, _ in ranking if doc_id not in vector_ids]
+        retrieved = self.client.retrieve(collection_name=collection_name, ids=missing, with_payload=True) if missing else []
+        return self._fused_points(ranking, vector_hits, retrieved)
+
+    async def _ahybrid_search(self, collection_name, query, category, limit, vector_hits):
+        ranking = self._fuse_rankings(vector_hits, self._lexical_hits(collection_name, query, category), limit)
+        vector_ids = {hit.id for hit in vector_hits}
+        missing = [doc_id for doc_id, _ in ranking if doc_id not in vector_ids]
+        retrieved = []
+        if missing:
+            retrieved = await self._bounded(self._aqdrant("retrieve", collection_name=collection_name, ids=missing, with_payload=True), self.search_timeout)
+        return self._fused_points(ranking, vector_hits, retrieved)
+
+    def search(self, query: str, category: str = None, limit: int = 15, embedding_type: str = "openai", threshold: float = 0):
+        logger.info(f"Performing search - query: {query}, category: {category}, limit: {limit}, embedding_type: {embedding_type}, threshold: {threshold}")
+        collection_name, cache_key, search_kwargs = self._prepare_search(query, category, limit, embedding_type, threshold)
+        cached = self._get_cached_results(collection_name, cache_key)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        embeddings = self._get_embeddings(embedding_type)
+        with timed("search", "embed"):
+            query_vector, full_vector = self._query_vectors(embedding_type, embeddings.embed_query(query))
+        with timed("search", "vector_search"):
+            search_result = self._vector_search(query_vector, search_kwargs, full_vector)
+        if embedding_type == HYBRID:
+            # The threshold already applied to the vector candidates; fused RRF scores are on another scale
+            with timed("search", "fusion"):
+                search_result = self._hybrid_search(collection_name, query, category, limit, search_result)
+            threshold = 0
+        with timed("search", "filter"):
+            return self._finish_search(search_result, collection_name, cache_key, limit, threshold, start)
+
+    def _vector_search_batch(self, collection_name, prepared, query_vectors):
+        if self.chunking.enabled:
+            # search_groups has no batch form; chunked collections search one query at a time
+            return [
+                self._vector_search(vector, search_kwargs, full_vector)
+                for (_, _, search_kwargs), (vector, full_vector) in zip(prepared, query_vectors)
+            ]
+        requests = [
+            models.SearchRequest(
+                vector=vector,
+                filter=search_kwargs["query_filter"],
+                limit=search_kwargs["limit"],
+                score_threshold=search_kwargs["score_threshold"],
+                params=search_kwargs["search_params"],
+                with_payload=True,
+            )
+            for (_, _, search_kwargs), (vector, _) in zip(prepared, query_vectors)
+        ]
+        hit_lists = self.client.search_batch(collection_name=collection_name, requests=requests)
+        reranked = [(hits, full_vector) for hits, (_, full_vector) in zip(hit_lists, query_vectors) if full_vector is not None]
+        if not reranked:
+            return hit_lists
+        # One retrieve of full-width vectors for every query's candidates
+        with timed("search_batch", "rerank"):
+            candidates = [hit for hits, _ in reranked for hit in hits]
+            points = self.client.retrieve(**self._full_vectors_kwargs(candidates)) if candidates else []
+            by_id = {point.id: point for point in points}
+            return [
+                self._rescored(hits, [by_id[hit.id] for hit in hits if hit.id in by_id], full_vector) if full_vector is not None else hits
+                for hits, (_, full_vector) in zip(hit_lists, query_vectors)
+            ]
+
+    def search_batch(self, queries, embedding_type: str = "openai"):
+        # queries: dicts with query and optional category, limit, threshold; results come back in input order
+        logger.info(f"Performing batch search - {len(queries)} queries, embedding_type: {embedding_type}")
+        collection_name = self._get_collection_name(embedding_type)
+        results = [None] * len(queries)
+        misses = []
+        for index, item in enumerate(queries):
+            _, cache_key, search_kwargs = self._prepare_search(
+                item["query"], item.get("category"), item.get("limit", 15), embedding_type, item.get("threshold", 0)
+            )
+            cached = self._get_cached_results(collection_name, cache_key)
+            if cached is not None:
+                results[index] = cached
+            else:
+                misses.append((index, cache_key, search_kwargs))
+        if not misses:
+            return results
+
+        start = time.perf_counter()
+        embeddings = self._get_embeddings(embedding_type)
+        with timed("search_batch", "embed"):
+            # One embedding call for the whole batch (the cache looks all texts up at once)
+            vectors = embeddings.embed_documents([queries[index]["query"] for index, _, _ in misses])
+            query_vectors = [self._query_vectors(embedding_type, vector) for vector in vectors]
+        with timed("search_batch", "vector_search"):
+            hit_lists = self._vector_search_batch(collection_name, misses, query_vectors)
+        with timed("search_batch", "filter"):
+            for (index, cache_key, _), hits in zip(misses, hit_lists):
+                item = queries[index]
+                limit, threshold = item.get("limit", 15), item.get("threshold", 0)
+                if embedding_type == HYBRID:
+                    hits = self._hybrid_search(collection_name, item["query"], item.get("category"), limit, hits)
+                    threshold = 0
+                results[index] = self._finish_search(hits, collection_name, cache_key, limit, threshold, start)
+        logger.info(f"Batch search completed, {len(queries) - len(misses)} served from cache, {len(misses)} searched "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return results
+
+    async def asearch_batch(self, queries, embedding_type: str = "openai"):
+        # One bounded slot for the whole batch: the embedding and Qdrant calls are already batched
+        return await self._bounded(asyncio.to_thread(self.search_batch, queries, embedding_type), self.search_timeout)
+
+    def _get_semaphore(self):
+        # Created lazily so it binds to the running event loop, not the one active at import time
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_calls)
+        return self._semaphore
+
+    async def _bounded(self, awaitable, timeout):
+        # Every outbound embedding, Qdrant and LLM call goes through here: at most
+        # MAX_CONCURRENT_CALLS are in flight and none may exceed its timeout
+        async with self._get_semaphore():
+            return await asyncio.wait_for(awaitable, timeout)
+
+    async def _aqdrant(self, method: str, **kwargs):
+        if self.async_client:
+            return await getattr(self.async_client, method)(**kwargs)
+        return await asyncio.to_thread(getattr(self.client, method), **kwargs)
+
+    async def asearch(self, query: str, category: str = None, limit: int = 15, embedding_type: str = "openai", threshold: float = 0):
+        logger.info(f"Performing async search - query: {query}, category: {category}, limit: {limit}, embedding_type: {embedding_type}, threshold: {threshold}")
+        collection_name, cache_key, search_kwargs = self._prepare_search(query, category, limit, embedding_type, threshold)
+        cached = self._get_cached_results(collection_name, cache_key)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        embeddings = await self._aget_embeddings(embedding_type)
+        with timed("search", "embed"):
+            query_vector = await self._bounded(embeddings.aembed_query(query), self.search_timeout)
+            query_vector, full_vector = self._query_vectors(embedding_type, query_vector)
+        with timed("search", "vector_search"):
+            search_result = await self._bounded(self._avector_search(query_vector, search_kwargs, full_vector), self.search_timeout)
+        if embedding_type == HYBRID:
+            with timed("search", "fusion"):
+                search_result = await self._ahybrid_search(collection_name, query, category, limit, search_result)
+            threshold = 0
+        with timed("search", "filter"):
+            return self._finish_search(search_result, collection_name, cache_key, limit, threshold, start)
+
     def get_article(self, article_id: int, embedding_type: str = "openai"):
         logger.info(f"Fetching article with id: {article_id}, embedding_type: {embedding_type}")
         collection_name = self._get_collection_name(embedding_type)
+        # Points are keyed on the numeric article id; older collections used UUIDs
+        if isinstance(article_id, str) and article_id.isdigit():
+            article_id = int(article_id)
         search_result = self.client.retrieve(
             collection_name=collection_name,
             ids=[article_id]
@@ -119,102 +531,306 @@ class SearchService:
         logger.info(f"Article found: {article_id}")
         return search_result[0]
 
-    def get_categories(self):
+    async def aget_article(self, article_id: int, embedding_type: str = "openai"):
+        logger.info(f"Fetching article with id: {article_id}, embedding_type: {embedding_type}")
+        collection_name = self._get_collection_name(embedding_type)
+        if isinstance(article_id, str) and article_id.isdigit():
+            article_id = int(article_id)
+        search_result = await self._bounded(self._aqdrant("retrieve", collection_name=collection_name, ids=[article_id]), self.search_timeout)
+        if not search_result:
+            logger.warning(f"Article not found: {article_id}")
+            return None
+        return search_result[0]
+
+    def _get_facet_index(self, collection_name):
+        if collection_name not in self.facet_indexes:
+            self.facet_indexes[collection_name] = FacetIndex(collection_name)
+        return self.facet_indexes[collection_name]
+
+    def _scroll_facets(self, collection_name):
+        # Fallback for collections ingested before the facet index existed; pages through every point
+        metadatas = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=int(os.getenv("CATEGORY_SCROLL_LIMIT", 10000)),
+                offset=offset,
+                # One point per article: skip the extra chunks of chunked collections
+                scroll_filter=Filter(must_not=[FieldCondition(key="chunk_index", range=models.Range(gt=0))]),
+                with_payload=["metadata"],
+                with_vectors=False
+            )
+            metadatas.extend((point.payload or {}).get("metadata", {}) for point in points)
+            if offset is None:
+                return build_facets(metadatas)
+
+    def get_facets(self, embedding_type: str = "openai"):
+        collection_name = self._get_collection_name(embedding_type)
+        facets = self._get_facet_index(collection_name).get()
+        if facets is None:
+            logger.warning(f"No facet index for {collection_name}, scrolling the collection")
+            facets = self._scroll_facets(collection_name)
+        return facets
+
+    def get_categories(self, embedding_type: str = "openai"):
         logger.info("Fetching categories")
-        groups = self.client.scroll(
-            collection_name=self.collection_name,
-            # scroll_filter=Filter(),
-            limit=int(os.getenv("CATEGORY_SCROLL_LIMIT", 10000)),
-            with_payload=True,
-            with_vectors=False
-        )[0]
-        
-        unique_groups = set(point.payload.get("metadata", {}).get("grupo") for point in groups if "grupo" in point.payload.get("metadata", {}))
-        logger.info(f"Retrieved {len(unique_groups)} categories")
-        return sorted(list(unique_groups))
-
-    def _get_embedding(self, text: str):
-        if isinstance(self.embeddings, OpenAIEmbeddings):
-            return self.embeddings.embed_query(text)
-        elif isinstance(self.embeddings, FastTextEmbeddings):
-            return self.embeddings.embed_query(text)
-        else:
-            raise ValueError(f"Unsupported embedding type: {type(self.embeddings)}")
+        categories = [value for value, _ in self.get_facets(embedding_type)["grupo"]]
+        logger.info(f"Retrieved {len(categories)} categories")
+        return categories
 
-    def rag_search(self, query: str, category: str = None):
-        logger.info(f"Performing RAG search - query: {query}, category: {category}")
-        
-        # Prepare the prompt
-        prompt_template = """
-        Use the following pieces of context to answer the question at the end. 
-        If you don't know the answer, just say that you don't know, don't try to make up an answer.
+    async def aget_categories(self, embedding_type: str = "openai"):
+        return await self._bounded(asyncio.to_thread(self.get_categories, embedding_type), self.search_timeout)
 
-        {context}
+    async def aget_facets(self, embedding_type: str = "openai"):
+        return await self._bounded(asyncio.to_thread(self.get_facets, embedding_type), self.search_timeout)
 
-        Question: {question}
-        Answer:"""
-        
-        PROMPT = PromptTemplate(
-            template=prompt_template, input_variables=["context", "question"]
+    def _rag_prompt(self, query: str, results):
+        context = "\n\n".join(
+            f"{r.payload.get('metadata', {}).get('pregunta', '')}\n"
+            f"{str(r.payload.get('metadata', {}).get('respuesta', '')).replace('_x000d_', '')[:self.rag_context_chars]}"
+            for r in results
         )
-        
-        # Update the qa_chain with the new prompt
-        self.qa_chain.combine_documents_chain.llm_chain.prompt = PROMPT
-        
-        # Perform the RAG search
-        result = self.qa_chain({"query": query})
-        
-        # Extract the answer and source documents
-        answer = result['result']
-        source_docs = result['source_documents']
-        
-        # Format the response
-        response = {
-            "answer": answer,
-            "sources": []
+        return RAG_PROMPT.format(context=context, question=query)
+
+    def _rag_timings(self, start, retrieval_seconds, first_token_at):
+        timings = {
+            "retrieval_ms": retrieval_seconds * 1000,
+            "time_to_first_token_ms": (first_token_at - start) * 1000 if first_token_at else None,
+            "total_ms": (time.perf_counter() - start) * 1000,
         }
-        
-        for doc in source_docs:
-            source = {}
-            for key, value in doc.metadata.items():
-                if isinstance(value, (int, str)):
-                    source[key] = value
-                elif isinstance(value, float):
-                    if np.isnan(value) or np.isinf(value):
-                        source[key] = str(value)
-                    else:
-                        source[key] = value
-                else:
-                    source[key] = str(value)
-            response["sources"].append(source)
-        
-        logger.info(f"RAG search completed, answer generated with {len(source_docs)} source documents")
+        if first_token_at:
+            observe("rag", "first_token", first_token_at - start)
+        observe("rag", "total", timings["total_ms"] / 1000)
+        logger.info(f"RAG answer: retrieval {timings['retrieval_ms']:.1f} ms, first token "
+                    f"{timings['time_to_first_token_ms'] or 0:.1f} ms, total {timings['total_ms']:.1f} ms")
+        return timings
+
+    def rag_search(self, query: str, category: str = None, embedding_type: str = "openai", threshold: float = 0.0, limit: int = None):
+        logger.info(f"Performing RAG search - query: {query}, category: {category}, embedding_type: {embedding_type}")
+        start = time.perf_counter()
+        # Same retrieval path (and result cache) as /search
+        results = self.search(query, category, limit or self.rag_top_k, embedding_type, threshold)
+        retrieval_seconds = time.perf_counter() - start
+        observe("rag", "retrieval", retrieval_seconds)
+        answer = self.llm([HumanMessage(content=self._rag_prompt(query, results))]).content
+        count_call("llm", "rag")
+        return {"answer": answer, "sources": results, "timings": self._rag_timings(start, retrieval_seconds, None)}
+
+    async def astream_rag(self, query: str, category: str = None, embedding_type: str = "openai", threshold: float = 0.0, limit: int = None):
+        # Yields ("sources", results), then ("token", text) as the LLM streams, then ("timings", {...})
+        logger.info(f"Performing streaming RAG search - query: {query}, category: {category}, embedding_type: {embedding_type}")
+        start = time.perf_counter()
+        results = await self.asearch(query, category, limit or self.rag_top_k, embedding_type, threshold)
+        retrieval_seconds = time.perf_counter() - start
+        observe("rag", "retrieval", retrieval_seconds)
+        yield "sources", results
+
+        first_token_at = None
+        deadline = time.perf_counter() + self.llm_timeout
+        llm = await self._aget_backend("llm")
+        count_call("llm", "rag")
+        async with self._get_semaphore():
+            chunks = llm.astream([HumanMessage(content=self._rag_prompt(query, results))])
+            try:
+                while True:
+                    # The timeout covers the whole completion, not each chunk
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.perf_counter()))
+                    except StopAsyncIteration:
+                        break
+                    if chunk.content:
+                        first_token_at = first_token_at or time.perf_counter()
+                        yield "token", chunk.content
+            finally:
+                await chunks.aclose()
+        yield "timings", self._rag_timings(start, retrieval_seconds, first_token_at)
+
+    async def arag_search(self, query: str, category: str = None, embedding_type: str = "openai", threshold: float = 0.0, limit: int = None):
+        response = {"answer": ""}
+        async for event, data in self.astream_rag(query, category, embedding_type, threshold, limit):
+            if event == "token":
+                response["answer"] += data
+            else:
+                response[event] = data
         return response
 
-    def search_with_ai_validation(self, query: str, category: str = None, limit: int = 15, threshold: float = 0.0, embedding_type: str = "openai"):
+    @staticmethod
+    def _validation_prompt(query: str, result):
+        article_text = result.payload.get('metadata', {}).get('respuesta', '')
+        article_title = result.payload.get('metadata', {}).get('pregunta', '')
+        return f"Query: {query}\n\nArticle Title: {article_title}\n\nArticle Text: {article_text}\n\nIs this article relevant to the query? Answer with 'Yes' or 'No' and a brief explanation."
+
+    @staticmethod
+    def _batch_validation_prompt(query: str, results):
+        articles = []
+        for index, result in enumerate(results):
+            metadata = result.payload.get('metadata', {})
+            articles.append(f"[{index}] Title: {metadata.get('pregunta', '')}\nText: {metadata.get('respuesta', '')}")
+        return (
+            f"Query: {query}\n\n" + "\n\n".join(articles) +
+            "\n\nWhich of the numbered articles are relevant to the query? "
+            'Reply with JSON only, in the form {"relevant": [<article numbers>]}.'
+        )
+
+    @staticmethod
+    def _parse_batch_verdicts(answer: str, count: int):
+        match = re.search(r'\{.*\}', answer, re.DOTALL)
+        try:
+            relevant = json.loads(match.group(0))["relevant"] if match else []
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Could not parse batched validation answer: {answer[:200]}")
+            relevant = []
+        return {int(i) for i in relevant if str(i).isdigit() and int(i) < count}
+
+    def _validation_mode(self, mode):
+        mode = (mode or os.getenv("AI_VALIDATION_MODE", "concurrent")).lower()
+        if mode not in AI_VALIDATION_MODES:
+            raise ValueError(f"Unsupported AI validation mode: {mode}")
+        return mode
+
+    def _cached_verdicts(self, query: str, results):
+        if not self.verdict_cache:
+            return [None] * len(results)
+        return self.verdict_cache.get_many(self.llm.model_name, query, results)
+
+    def _store_verdicts(self, query: str, judged):
+        if self.verdict_cache and judged:
+            self.verdict_cache.put_many(self.llm.model_name, query, [r for r, _ in judged], [v for _, v in judged])
+
+    def _apply_batch_verdicts(self, query: str, search_results, verdicts, pending, answer: str, limit: int):
+        relevant = self._parse_batch_verdicts(answer, len(pending))
+        judged = [(result, index in relevant) for index, result in enumerate(pending)]
+        self._store_verdicts(query, judged)
+        fresh = iter(verdict for _, verdict in judged)
+        verdicts = [verdict if verdict is not None else next(fresh) for verdict in verdicts]
+        return [result for result, verdict in zip(search_results, verdicts) if verdict][:limit]
+
+    @staticmethod
+    def _is_relevant(llm_response):
+        return llm_response.content.lower().startswith('yes')
+
+    def _validation_candidates(self, query: str, search_results):
+        # Previously judged (query, article version) pairs never reach the LLM again
+        verdicts = self._cached_verdicts(query, search_results)
+        pending = [result for result, verdict in zip(search_results, verdicts) if verdict is None]
+        count_cache("verdict", "hit", len(search_results) - len(pending))
+        count_cache("verdict", "miss", len(pending))
+        return verdicts, pending
+
+    def _with_leftover_verdicts(self, search_results, judged, calls):
+        # Calls that finished after the early stop were paid for, so their verdicts are cached too.
+        # `calls` maps candidate index to a concurrent.futures.Future or an asyncio.Task.
+        for index, call in calls.items():
+            if index not in judged and call.done() and not call.cancelled() and call.exception() is None:
+                judged[index] = (search_results[index], self._is_relevant(call.result()))
+        return list(judged.values())
+
+    def _finish_validation(self, mode, search_results, pending, validated_results, llm_calls, start):
+        validation_seconds = time.perf_counter() - start
+        observe("ai_validation", "validation", validation_seconds)
+        logger.info(f"AI validation ({mode}) kept {len(validated_results)} of {len(search_results)} candidates, "
+                    f"{len(search_results) - len(pending)} verdicts cached, {llm_calls} LLM verdicts awaited in {validation_seconds * 1000:.1f} ms")
+        return validated_results
+
+    def _validate_one(self, query: str, result):
+        # Runs on the executor; cancelled futures never start, so only requests actually sent are counted
+        count_call("llm", "validation_concurrent")
+        return self.llm([HumanMessage(content=self._validation_prompt(query, result))])
+
+    def search_with_ai_validation(self, query: str, category: str = None, limit: int = 15, threshold: float = 0.0, embedding_type: str = "openai", mode: str = None):
         logger.info(f"Performing AI-validated search - query: {query}, category: {category}, limit: {limit}, threshold: {threshold}, embedding_type: {embedding_type}")
+        mode = self._validation_mode(mode)
         
         # Perform the initial search
+        start = time.perf_counter()
         search_results = self.search(query, category, limit * 2, embedding_type, threshold)
+        observe("ai_validation", "retrieval", time.perf_counter() - start)
 
-        validated_results = []
-        for result in search_results:
-            # Extract relevant information from the search result
-            article_text = result.payload.get('metadata', {}).get('respuesta', '')
-            article_title = result.payload.get('metadata', {}).get('pregunta', '')
+        start = time.perf_counter()
+        verdicts, pending = self._validation_candidates(query, search_results)
+        llm_calls = 0
+        if mode == "batched":
+            answer = ""
+            if pending:
+                count_call("llm", "validation_batched")
+                answer = self.llm([HumanMessage(content=self._batch_validation_prompt(query, pending))]).content
+                llm_calls = 1
+            validated_results = self._apply_batch_verdicts(query, search_results, verdicts, pending, answer, limit)
+        else:
+            validated_results = []
+            judged = {}
+            # Not a with-block: its exit would wait for every in-flight call after an early stop
+            executor = ThreadPoolExecutor(max_workers=max(1, self.validation_fanout))
+            try:
+                futures = {
+                    index: executor.submit(self._validate_one, query, result)
+                    for index, (result, verdict) in enumerate(zip(search_results, verdicts)) if verdict is None
+                }
+                # Walk the candidates in rank order so early stopping keeps the best-ranked articles
+                for index, (result, verdict) in enumerate(zip(search_results, verdicts)):
+                    if verdict is None:
+                        verdict = self._is_relevant(futures[index].result())
+                        judged[index] = (result, verdict)
+                        llm_calls += 1
+                    if verdict:
+                        validated_results.append(result)
+                        if len(validated_results) >= limit:
+                            break
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._store_verdicts(query, self._with_leftover_verdicts(search_results, judged, futures))
+        return self._finish_validation(mode, search_results, pending, validated_results, llm_calls, start)
+
+    async def asearch_with_ai_validation(self, query: str, category: str = None, limit: int = 15, threshold: float = 0.0, embedding_type: str = "openai", mode: str = None):
+        logger.info(f"Performing async AI-validated search - query: {query}, category: {category}, limit: {limit}, threshold: {threshold}, embedding_type: {embedding_type}")
+        mode = self._validation_mode(mode)
 
-            # Prepare the prompt for the LLM
-            prompt = f"Query: {query}\n\nArticle Title: {article_title}\n\nArticle Text: {article_text}\n\nIs this article relevant to the query? Answer with 'Yes' or 'No' and a brief explanation."
-            
-            # Create a HumanMessage object
-            message = HumanMessage(content=prompt)
+        start = time.perf_counter()
+        search_results = await self.asearch(query, category, limit * 2, embedding_type, threshold)
+        observe("ai_validation", "retrieval", time.perf_counter() - start)
 
-            # Get the LLM's response
-            llm_response = self.llm([message])
-            llm_answer = llm_response.content
+        start = time.perf_counter()
+        llm = await self._aget_backend("llm")
+        # The verdict cache is SQLite, so lookups and writes run in a worker thread
+        verdicts, pending = await asyncio.to_thread(self._validation_candidates, query, search_results)
+        llm_calls = 0
+        if mode == "batched":
+            answer = ""
+            if pending:
+                prompt = self._batch_validation_prompt(query, pending)
+                count_call("llm", "validation_batched")
+                answer = (await self._bounded(llm.ainvoke([HumanMessage(content=prompt)]), self.llm_timeout)).content
+                llm_calls = 1
+            validated_results = await asyncio.to_thread(self._apply_batch_verdicts, query, search_results, verdicts, pending, answer, limit)
+        else:
+            fanout = asyncio.Semaphore(max(1, self.validation_fanout))
 
-            # Check if the LLM considers the article relevant
-            if llm_answer.lower().startswith('yes'):
-                validated_results.append(result)
+            async def validate(result):
+                async with fanout:
+                    prompt = self._validation_prompt(query, result)
+                    count_call("llm", "validation_concurrent")
+                    return await self._bounded(llm.ainvoke([HumanMessage(content=prompt)]), self.llm_timeout)
 
-        return validated_results
\ No newline at end of file
+            tasks = {
+                index: asyncio.create_task(validate(result))
+                for index, (result, verdict) in enumerate(zip(search_results, verdicts)) if verdict is None
+            }
+            validated_results = []
+            judged = {}
+            try:
+                # Await in rank order so early stopping keeps the best-ranked articles
+                for index, (result, verdict) in enumerate(zip(search_results, verdicts)):
+                    if verdict is None:
+                        verdict = self._is_relevant(await tasks[index])
+                        judged[index] = (result, verdict)
+                        llm_calls += 1
+                    if verdict:
+                        validated_results.append(result)
+                        if len(validated_results) >= limit:
+                            break
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+            await asyncio.to_thread(self._store_verdicts, query, self._with_leftover_verdicts(search_results, judged, tasks))
+        return self._finish_validation(mode, search_results, pending, validated_results, llm_calls, start)
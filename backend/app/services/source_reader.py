@@ -0,0 +1,92 @@
+import os
+import json
+import math
+import logging
+from .hashing import content_hash
+from .paths import state_path, atomic_write
+
+logger = logging.getLogger(__name__)
+
+SOURCE_COLUMNS = ("id", "pregunta", "respuesta", "grupo", "tema")
+_FILTER_COLUMNS = ("obsoleto", "revisado")
+
+
+def _cell(value):
+    # pandas.read_excel reads empty cells as NaN; keep that so str(), hashes and payloads are unchanged
+    return math.nan if value is None or value == "" else value
+
+
+def _is_live(obsoleto, revisado):
+    # Same filter as before: not marked obsolete and reviewed
+    return obsoleto in (None, "") and revisado == 's'
+
+
+def _iter_workbook(file_path, columns):
+    # openpyxl read-only mode parses the sheet XML as a stream instead of building a DataFrame
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else None for name in next(rows, ())]
+        missing = [name for name in columns + _FILTER_COLUMNS if name not in header]
+        if missing:
+            raise ValueError(f"Source file {file_path} is missing columns: {missing}")
+        positions = [header.index(name) for name in columns]
+        obsoleto, revisado = (header.index(name) for name in _FILTER_COLUMNS)
+        for row in rows:
+            if len(row) <= max(positions + [obsoleto, revisado]):
+                row = tuple(row) + (None,) * (len(header) - len(row))
+            if _is_live(row[obsoleto], row[revisado]):
+                yield {name: _cell(row[position]) for name, position in zip(columns, positions)}
+    finally:
+        workbook.close()
+
+
+class SourceReader:
+    # Yields the live articles of the Excel export as dicts of SOURCE_COLUMNS. The first full pass
+    # also writes them to a JSONL snapshot in STATE_DIR, so later stages and runs stream the snapshot
+    # instead of parsing the workbook again, until the workbook changes.
+    def __init__(self, file_path, columns=SOURCE_COLUMNS):
+        self.file_path = file_path
+        self.columns = tuple(columns)
+        self.snapshot_path = state_path(f"source_{os.path.basename(file_path)}.{content_hash(os.path.abspath(file_path), self.columns)[:12]}.jsonl")
+
+    def signature(self):
+        stat = os.stat(self.file_path)
+        return content_hash(os.path.abspath(self.file_path), stat.st_size, stat.st_mtime_ns, self.columns)
+
+    def _iter_snapshot(self, signature):
+        try:
+            f = open(self.snapshot_path, encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        if json.loads(f.readline() or "{}").get("signature") != signature:
+            f.close()
+            return None
+        return self._records(f)
+
+    @staticmethod
+    def _records(f):
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    def _iter_and_snapshot(self, signature):
+        count = 0
+        # Only a completely consumed pass becomes the snapshot
+        with atomic_write(self.snapshot_path, encoding="utf-8") as f:
+            f.write(json.dumps({"signature": signature}) + "\n")
+            for record in _iter_workbook(self.file_path, self.columns):
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                count += 1
+                yield record
+        logger.info(f"Read {count} live articles from {self.file_path}, snapshot at {self.snapshot_path}")
+
+    def __iter__(self):
+        signature = self.signature()
+        records = self._iter_snapshot(signature)
+        return records if records is not None else self._iter_and_snapshot(signature)
+
+
+def iter_articles(file_path=None, columns=SOURCE_COLUMNS):
+    return iter(SourceReader(file_path or os.getenv("EXCEL_FILE_PATH"), columns))
@@ -4,16 +4,18 @@ import fasttext
 import mlflow
 import tempfile
 import yaml
-import numpy as np
-from scipy.stats import spearmanr
-from sklearn.metrics.pairwise import cosine_similarity
+import time
+from .fasttext_eval import evaluate_retrieval, retrieval_pairs
+from .fasttext_mmap import MmapFastTextModel, load_quantized_model, quantized_dir_for, quantized_enabled
 
 logger = logging.getLogger(__name__)
 
 class FastTextTrainer:
-    def __init__(self, model_path, get_preprocessed_texts_func, config_path):
+    def __init__(self, model_path, get_preprocessed_texts_func, config_path, get_records_func=None):
         self.model_path = model_path
         self.get_preprocessed_texts = get_preprocessed_texts_func
+        # Source articles (dicts with pregunta/respuesta) the retrieval evaluation queries
+        self.get_records = get_records_func
         self.config = self.load_config(config_path)
 
     def load_config(self, config_path):
@@ -23,13 +25,20 @@ class FastTextTrainer:
     def load_or_train_model(self):
         if not os.path.exists(self.model_path):
             logger.info(f"FastText model not found at {self.model_path}. Training new model.")
-            return self.train_fasttext()
+            model = self.train_fasttext()
         else:
             try:
-                return fasttext.load_model(self.model_path)
+                model = fasttext.load_model(self.model_path)
             except Exception as e:
                 logger.error(f"Failed to load FastText model from {self.model_path}: {str(e)}")
                 raise ValueError(f"Failed to load FastText model: {str(e)}")
+        if quantized_enabled():
+            # Ingestion must embed with the same compressed model the API serves
+            return load_quantized_model(self.model_path, self.config)
+        return model
+
+    def quantize_requested(self):
+        return 'quantize' in self.config or quantized_enabled()
 
     def train_fasttext(self):
         mlflow.set_experiment("FastText Training - Spanish")
@@ -57,16 +66,10 @@ class FastTextTrainer:
                     thread=self.config['thread']
                 )
 
-                # Calculate metrics
-                semantic_similarity = self.evaluate_semantic_similarity(model)
-                analogy_task = self.evaluate_analogy_task(model)
-                word_similarity = self.evaluate_word_similarity(model)
-
-                # Log parameters and metrics
+                # Log parameters and retrieval metrics
+                pairs = self.retrieval_pairs()
                 mlflow.log_params(self.config)
-                mlflow.log_metric("semantic_similarity", semantic_similarity)
-                mlflow.log_metric("analogy_task", analogy_task)
-                mlflow.log_metric("word_similarity", word_similarity)
+                mlflow.log_metrics(self.evaluate_retrieval(model, pairs))
 
                 # Log the model as an artifact
                 with tempfile.NamedTemporaryFile(mode='w', delete=False) as model_file:
@@ -74,8 +77,12 @@ class FastTextTrainer:
                 model.save_model(model_file_path)
                 mlflow.log_artifact(model_file_path, "model")
 
-            # Save the model outside of the mlflow run
-            model.save_model(self.model_path)
+                model.save_model(self.model_path)
+                if self.quantize_requested():
+                    quantization_metrics = self.evaluate_quantization(model, pairs)
+                    mlflow.log_params({f"quantize_{key}": value for key, value in (self.config.get('quantize') or {}).items()})
+                    mlflow.log_metrics(quantization_metrics)
+
             return model
 
         finally:
@@ -85,56 +92,54 @@ class FastTextTrainer:
             if model_file_path and os.path.exists(model_file_path):
                 os.unlink(model_file_path)
 
-    def evaluate_semantic_similarity(self, model):
-        word_pairs = [
-            ("gato", "perro"),
-            ("feliz", "triste"),
-            ("rey", "reina"),
-            ("hombre", "mujer"),
-            ("bueno", "malo")
-        ]
-        similarities = []
-        for word1, word2 in word_pairs:
-            vec1 = model.get_word_vector(word1)
-            vec2 = model.get_word_vector(word2)
-            similarity = cosine_similarity([vec1], [vec2])[0][0]
-            similarities.append(similarity)
-        return np.mean(similarities)
-
-    def evaluate_analogy_task(self, model):
-        analogies = [
-            ("hombre", "mujer", "rey", "reina"),
-            ("madrid", "españa", "parís", "francia"),
-            ("grande", "más grande", "pequeño", "más pequeño")
-        ]
-        correct = 0
-        for a, b, c, d in analogies:
-            result = model.get_analogies(a, b, c)
-            if d in [word for word, _ in result]:
-                correct += 1
-        return correct / len(analogies)
-
-    def evaluate_word_similarity(self, model):
-        rg65_spanish_pairs = [
-            ("coche", "automóvil", 0.98),
-            ("viaje", "vuelo", 0.36),
-            ("hotel", "reservación", 0.41),
-            ("comida", "fruta", 0.23),
-            ("tren", "coche", 0.13)
-        ]
-        model_similarities = []
-        human_similarities = []
-        for word1, word2, human_score in rg65_spanish_pairs:
-            vec1 = model.get_word_vector(word1)
-            vec2 = model.get_word_vector(word2)
-            model_similarity = cosine_similarity([vec1], [vec2])[0][0]
-            model_similarities.append(model_similarity)
-            human_similarities.append(human_score)
-        correlation, _ = spearmanr(model_similarities, human_similarities)
-        return correlation
-
-def main(model_path, get_preprocessed_texts_func, config_path):
-    trainer = FastTextTrainer(model_path, get_preprocessed_texts_func, config_path)
+    def evaluate_quantization(self, model, pairs, k=10):
+        # Compares the compressed export with the full model on size, load time, embedding
+        # latency and retrieval quality over the same pregunta -> article queries
+        quantized = load_quantized_model(self.model_path, self.config)
+        quantized_dir = quantized_dir_for(self.model_path)
+
+        start = time.perf_counter()
+        fasttext.load_model(self.model_path)
+        full_load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        MmapFastTextModel(quantized_dir)
+        quantized_load_seconds = time.perf_counter() - start
+
+        full_size = os.path.getsize(self.model_path)
+        quantized_size = sum(entry.stat().st_size for entry in os.scandir(quantized_dir))
+
+        metrics = {
+            'full_size_mb': full_size / (1024 * 1024),
+            'quantized_size_mb': quantized_size / (1024 * 1024),
+            'compression_ratio': full_size / quantized_size if quantized_size else 0.0,
+            'full_load_seconds': full_load_seconds,
+            'quantized_load_seconds': quantized_load_seconds,
+        }
+        if pairs:
+            for name, embedder in (('full', model), ('quantized', quantized)):
+                retrieval = evaluate_retrieval(embedder, pairs, ks=(k,))
+                metrics[f'{name}_embed_ms'] = 1000 / retrieval['documents_embedded_per_second'] if retrieval['documents_embedded_per_second'] else 0.0
+                metrics[f'{name}_recall_at_{k}'] = retrieval[f'recall_at_{k}']
+                metrics[f'{name}_mrr'] = retrieval['mrr']
+            metrics[f'recall_at_{k}_delta'] = metrics[f'quantized_recall_at_{k}'] - metrics[f'full_recall_at_{k}']
+            metrics['mrr_delta'] = metrics['quantized_mrr'] - metrics['full_mrr']
+        logger.info(f"Quantization evaluation: {metrics}")
+        return metrics
+
+    def retrieval_pairs(self):
+        if self.get_records is None:
+            logger.warning("No article source given to the trainer; skipping retrieval evaluation")
+            return []
+        return retrieval_pairs(self.get_records())
+
+    def evaluate_retrieval(self, model, pairs):
+        # Recall@k/MRR of each pregunta retrieving its own article, plus embedding throughput
+        metrics = evaluate_retrieval(model, pairs)
+        logger.info(f"Retrieval evaluation: {metrics}")
+        return metrics
+
+def main(model_path, get_preprocessed_texts_func, config_path, get_records_func=None):
+    trainer = FastTextTrainer(model_path, get_preprocessed_texts_func, config_path, get_records_func)
     model = trainer.load_or_train_model()
     logger.info(f"FastText model loaded/trained successfully. Model path: {model_path}")
     return model
@@ -0,0 +1,103 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from functools import lru_cache
+from .hashing import content_hash
+from .embedding_cache import normalize_text
+from .paths import state_path
+
+logger = logging.getLogger(__name__)
+
+
+def article_hash(metadata):
+    return content_hash(str(metadata.get('pregunta', '')), str(metadata.get('respuesta', '')))
+
+
+class VerdictCache:
+    # Persistent LLM relevance verdicts keyed on (model, normalized query, article id, article content)
+    def __init__(self, path=None, max_items=None):
+        self.path = path or os.getenv("VERDICT_CACHE_PATH") or state_path("verdict_cache.sqlite")
+        self.max_items = int(max_items or os.getenv("VERDICT_CACHE_MAX_ITEMS", 100000))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts "
+            "(key TEXT PRIMARY KEY, article_id TEXT, article_hash TEXT, relevant INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_article ON verdicts (article_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name, query, article_id, metadata):
+        return content_hash(model_name, normalize_text(query), str(article_id), article_hash(metadata))
+
+    def get_many(self, model_name, query, results):
+        keys = [self.make_key(model_name, query, r.id, r.payload.get('metadata', {})) for r in results]
+        with self._lock:
+            rows = dict(self._conn.execute(
+                f"SELECT key, relevant FROM verdicts WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()) if keys else {}
+            if rows:
+                now = time.time()
+                self._conn.executemany("UPDATE verdicts SET last_used = ? WHERE key = ?", [(now, key) for key in rows])
+                self._conn.commit()
+            self.hits += len(rows)
+            self.misses += len(keys) - len(rows)
+        return [bool(rows[key]) if key in rows else None for key in keys]
+
+    def put_many(self, model_name, query, results, verdicts):
+        now = time.time()
+        rows = [
+            (self.make_key(model_name, query, r.id, r.payload.get('metadata', {})), str(r.id),
+             article_hash(r.payload.get('metadata', {})), int(relevant), now)
+            for r, relevant in zip(results, verdicts)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (key, article_id, article_hash, relevant, last_used) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            # Evict the least recently used verdicts once the table outgrows its bound
+            count = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            if count > self.max_items:
+                self._conn.execute(
+                    "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY last_used LIMIT ?)",
+                    (count - self.max_items,)
+                )
+            self._conn.commit()
+
+    def prune(self, current_hashes):
+        # Called at ingestion with {article_id: article_hash} for every live article; drops
+        # verdicts for articles that were removed or whose pregunta/respuesta changed
+        with self._lock:
+            stored = self._conn.execute("SELECT DISTINCT article_id, article_hash FROM verdicts").fetchall()
+            stale = [(article_id, hash_) for article_id, hash_ in stored if current_hashes.get(article_id) != hash_]
+            self._conn.executemany("DELETE FROM verdicts WHERE article_id = ? AND article_hash = ?", stale)
+            self._conn.commit()
+        if stale:
+            logger.info(f"Verdict cache: dropped verdicts for {len(stale)} changed or removed article versions")
+        return len(stale)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_verdict_cache():
+    return VerdictCache()
+
+
+def verdict_cache_enabled():
+    return os.getenv("VERDICT_CACHE", "true").lower() not in ("0", "false", "no")
@@ -1,12 +1,13 @@
 from bs4 import BeautifulSoup
 import os
 import pandas as pd
-import re
-from collections import Counter
 import fasttext
 from dotenv import load_dotenv
 import matplotlib.pyplot as plt
 import seaborn as sns
+from app.services.preprocessing import preprocess_html, preprocess_many
+from app.services.source_reader import iter_articles
+from app.services.corpus_profile import GALICIAN_LABELS, load_or_build_profile
 
 load_dotenv()
 
@@ -25,48 +26,16 @@ def extract_text_from_html(html_content: str) -> str:
 
 
 def preprocess_text(html_content,keep_accent:bool=True):
-    # Remove HTML tags
-    soup = BeautifulSoup(html_content, 'html.parser')
-    text = soup.get_text()
-    # Remove special characters but keep some punctuatio
-    if keep_accent:
-        text = re.sub(r'[^a-zA-Z0-9áéíóúÁÉÍÓÚüÜñÑ\s.,!?]', ' ', text)        
-    else:
-        text = re.sub(r'[^a-zA-Z0-9\s.,!?]', ' ', text)
-    # Convert to lowercase and remove extra whitespace
-    text = text.lower().strip()
-    text = re.sub(r'\s+', ' ', text)
-
-    return text
+    # Shared single-pass implementation, memoized across ingestion, training and analysis
+    return preprocess_html(html_content, keep_accent)
 
 
 def get_preprocessed_texts():
-    # Load and filter
-    file_path = os.getenv("EXCEL_FILE_PATH")
-    df = pd.read_excel(file_path)
-    df = df[df['obsoleto'].isna()]
-    df = df[df['revisado'] == 's']
-    df = df.reset_index(drop=True)
-    # process
-    texts = []
-    for _, row in df.iterrows():
-        pregunta_html = str(row['pregunta'])
-        respuesta_html = str(row['respuesta'])
-        
-        pregunta_text = preprocess_text(pregunta_html)
-        respuesta_text = preprocess_text(respuesta_html)
-        
-        full_text = pregunta_text + ' ' + respuesta_text
-        metadata = {
-            'id': int(row['id']),
-            'pregunta': pregunta_html,
-            'respuesta': respuesta_html,
-            'grupo': row['grupo'],
-            'tema': row['tema']
-        }
-        texts.append(full_text)
-    
-    return texts 
+    # Streams the live rows of EXCEL_FILE_PATH (the snapshot after the first pass)
+    records = list(iter_articles())
+    preguntas = preprocess_many([str(record['pregunta']) for record in records], keep_accent=True)
+    respuestas = preprocess_many([str(record['respuesta']) for record in records], keep_accent=True)
+    return [pregunta + ' ' + respuesta for pregunta, respuesta in zip(preguntas, respuestas)]
 
 class Analysis:
     '''
@@ -75,51 +44,41 @@ class Analysis:
     '''
     def __init__(self, model_path):
         self.mode_path=model_path
-        self.model = fasttext.load_model(model_path)
+        self._model = None
         self.preprocess_text=preprocess_text
         self.keep_accent : bool =False
+        self._profile = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = fasttext.load_model(self.mode_path)
+        return self._model
+
+    @property
+    def profile(self):
+        # Computed in one pass over the articles and cached in STATE_DIR until the export or model changes;
+        # the language model is only loaded when the profile has to be rebuilt
+        if self._profile is None:
+            self._profile = load_or_build_profile(os.getenv('EXCEL_FILE_PATH'), self._model, self.mode_path)
+        return self._profile
 
     def get_language(self):
-        df = self._load_text()
-        n_gl = 0
-        total_palabras = 0
-        for _, row in df.iterrows():
-            pregunta_text = self.preprocess_text(str(row['pregunta']),self.keep_accent)
-            respuesta_text = self.preprocess_text(str(row['respuesta']),self.keep_accent)
-            full_text = pregunta_text + ' ' + respuesta_text
-            total_palabras += self.contar_palabras(full_text)
-            if self._is_galician(respuesta_text,self.mode_path):
-                n_gl += 1
-        perct = n_gl / len(df)
+        profile = self.profile
+        perct = profile['language']['galician_share'] if profile['language'] else 0.0
         print(f'El total de documentos en gallego es: {perct*100:.2f}%')
-        print(f'El número total de palabras en los textos procesados es: {total_palabras}')
-
-    @staticmethod
-    def _load_text():
-        file_path = os.getenv("EXCEL_FILE_PATH")
-        df = pd.read_excel(file_path)
-        df = df[df['obsoleto'].isna()]
-        df = df[df['revisado'] == 's']
-        return df.reset_index(drop=True)
-    
+        print(f'El número total de palabras en los textos procesados es: {profile["total_words"]}')
+
     def contar_palabras(self,texto):
         return len(texto.split())
 
     def _is_galician(self, text: str, model_path: str, threshold: float = 0.0):
         prediction = self.model.predict(text, k=1)
         label, confidence = prediction[0][0], prediction[1][0]
-        return label in ['__label__gl','__label__pt'] and confidence >= threshold
+        return label in GALICIAN_LABELS and confidence >= threshold
     
     def get_distribution(self):
-        df=self._load_text()
-        distribution=[]
-        for _,row in df.iterrows():
-
-            pregunta_text = self.preprocess_text(str(row['pregunta']),self.keep_accent)
-            respuesta_text = self.preprocess_text(str(row['respuesta']),self.keep_accent)
-            full_text = pregunta_text + ' ' + respuesta_text
-            distribution.append(self.contar_palabras(full_text))
-        return distribution
+        return self.profile['word_counts']
     
     def plot_distribution(self):
         distribution = self.get_distribution()
@@ -138,15 +97,7 @@ class Analysis:
         print(f"Median: {sorted(distribution)[len(distribution)//2]}")
 
     def plot_top_words(self, n:int=20):
-        df = self._load_text()
-        all_words = []
-        for _, row in df.iterrows():
-            pregunta_text = self.preprocess_text(str(row['pregunta']))
-            respuesta_text = self.preprocess_text(str(row['respuesta']))
-            all_words.extend(pregunta_text.split() + respuesta_text.split())
-        
-        word_freq = Counter(all_words)
-        top_words = dict(word_freq.most_common(n))
+        top_words = dict(self.profile['top_words'][:n])
         
         plt.figure(figsize=(12, 6))
         plt.bar(top_words.keys(), top_words.values())
@@ -158,11 +109,10 @@ class Analysis:
         plt.show()
 
     def plot_group_distribution(self):
-        df = self._load_text()
-        group_counts = df['grupo'].value_counts()
+        group_counts = self.profile['group_counts']
         
         plt.figure(figsize=(10, 6))
-        sns.barplot(x=group_counts.index, y=group_counts.values)
+        sns.barplot(x=list(group_counts.keys()), y=list(group_counts.values()))
         plt.title('Distribution of Texts by Group')
         plt.xlabel('Group')
         plt.ylabel('Number of Texts')
@@ -171,8 +121,10 @@ class Analysis:
         plt.show()
 
     def plot_word_count_by_group(self):
-        df = self._load_text()
-        df['word_count'] = df.apply(lambda row: self.contar_palabras(self.preprocess_text(str(row['pregunta'])) + ' ' + self.preprocess_text(str(row['respuesta']))), axis=1)
+        df = pd.DataFrame(
+            [(grupo, count) for grupo, counts in self.profile['group_word_counts'].items() for count in counts],
+            columns=['grupo', 'word_count'],
+        )
         
         plt.figure(figsize=(12, 6))
         sns.boxplot(x='grupo', y='word_count', data=df)
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from dotenv import load_dotenv
+from app.services.resources import current_rss_bytes, current_pss_bytes
+
+load_dotenv()
+
+DEFAULT_QUERIES = [
+    "como cambiar la clave de la tarjeta",
+    "bloqueo de tarjeta de credito",
+    "transferencias a otros bancos",
+    "requisitos para solicitar un prestamo",
+    "no puedo ingresar a la banca en linea",
+]
+
+
+def load_model(mode, model_path):
+    if mode == "mmap":
+        from app.services.fasttext_mmap import load_mmap_model
+        return load_mmap_model(model_path)
+    if mode == "quantized":
+        from app.services.fasttext_mmap import load_quantized_model
+        return load_quantized_model(model_path)
+    import fasttext
+    return fasttext.load_model(model_path)
+
+
+def worker(mode, model_path, queries, repeats, ready, results):
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    model = load_model(mode, model_path)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    vectors = [model.get_sentence_vector(query) for query in queries]
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            model.get_sentence_vector(query)
+            latencies.append(time.perf_counter() - start)
+
+    # Wait until every worker has its model resident so PSS reflects pages shared between them
+    ready.wait()
+    pss = current_pss_bytes()
+    results.put({
+        'load_seconds': load_seconds,
+        'rss_mb': (current_rss_bytes() - rss_before) / (1024 * 1024),
+        'pss_mb': pss / (1024 * 1024) if pss is not None else None,
+        'latencies': latencies,
+        'vectors': np.asarray(vectors),
+    })
+    ready.wait()
+
+
+def run_mode(mode, model_path, queries, repeats, workers):
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, model_path, queries, repeats, ready, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    reports = [results.get() for _ in processes]
+    ready.wait()
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for report in reports for latency in report['latencies'])
+    pss = [report['pss_mb'] for report in reports if report['pss_mb'] is not None]
+    return {
+        'mode': mode,
+        'workers': workers,
+        'load_seconds': max(report['load_seconds'] for report in reports),
+        'rss_mb_per_worker': sum(report['rss_mb'] for report in reports) / workers,
+        'total_pss_mb': sum(pss) if pss else None,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'vectors': reports[0]['vectors'],
+    }
+
+
+def main(model_path, modes, queries, repeats, workers):
+    print(f"Benchmarking {model_path} with {workers} worker(s), {len(queries)} queries x {repeats} repeats")
+    print(f"{'mode':>10} {'load s':>8} {'RSS MB/worker':>14} {'total PSS MB':>13} {'p50 ms':>8} {'p99 ms':>8}")
+    reports = []
+    for mode in modes:
+        report = run_mode(mode, model_path, queries, repeats, workers)
+        reports.append(report)
+        pss = f"{report['total_pss_mb']:.1f}" if report['total_pss_mb'] is not None else "n/a"
+        print(f"{mode:>10} {report['load_seconds']:>8.2f} {report['rss_mb_per_worker']:>14.1f} {pss:>13} "
+              f"{report['p50_ms']:>8.3f} {report['p99_ms']:>8.3f}")
+    if len(reports) > 1:
+        baseline = reports[0]['vectors']
+        for report in reports[1:]:
+            diff = float(np.abs(report['vectors'] - baseline).max())
+            print(f"Max abs difference {report['mode']} vs {reports[0]['mode']}: {diff:.2e}")
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare memory and query latency of FastText loading modes")
+    parser.add_argument("--model-path", default=os.getenv("FASTTEXT_MODEL_PATH"), help="FastText .bin model (default: FASTTEXT_MODEL_PATH)")
+    parser.add_argument("--modes", default="load,mmap", help="comma separated modes: load (fasttext.load_model), mmap, quantized")
+    parser.add_argument("--queries", default=None, help="file with one query per line (default: built-in samples)")
+    parser.add_argument("--repeats", type=int, default=200, help="times each query is embedded per worker")
+    parser.add_argument("--workers", type=int, default=4, help="processes per mode, to measure page sharing")
+    args = parser.parse_args()
+
+    if not args.model_path or not os.path.exists(args.model_path):
+        print(f"Error: FastText model '{args.model_path}' does not exist.")
+        sys.exit(1)
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    main(args.model_path, [mode.strip() for mode in args.modes.split(",")], queries, args.repeats, args.workers)
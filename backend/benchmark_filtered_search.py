@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+from qdrant_client import models
+from qdrant_client.models import Filter, FieldCondition, MatchValue
+from app.services.search_service import SearchService
+from app.services.data_ingestion import PAYLOAD_INDEXES
+from app.services.retrieval_metrics import percentile
+
+load_dotenv()
+
+DEFAULT_QUERIES = [
+    "como cambiar la clave de la tarjeta",
+    "bloqueo de tarjeta de credito",
+    "transferencias a otros bancos",
+    "requisitos para solicitar un prestamo",
+    "no puedo ingresar a la banca en linea",
+]
+
+
+def filtered_search(service, collection_name, vector, grupo, limit, fetch, threshold, exact=False, pushdown=False):
+    # pushdown passes the threshold to Qdrant as score_threshold, the way SearchService does
+    hits = service.client.search(
+        collection_name=collection_name,
+        query_vector=vector,
+        query_filter=Filter(must=[FieldCondition(key="metadata.grupo", match=MatchValue(value=grupo))]),
+        limit=fetch,
+        score_threshold=threshold if pushdown and threshold else None,
+        search_params=models.SearchParams(hnsw_ef=int(os.getenv("HNSW_EF", 128)), exact=exact),
+    )
+    return [hit for hit in hits if hit.score >= threshold][:limit]
+
+
+def main(embedding_type, queries, categories, limit, threshold, repeats, create_indexes):
+    service = SearchService()
+    collection_name = service._get_collection_name(embedding_type)
+    if create_indexes:
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            service.client.create_payload_index(collection_name, field_name=field_name, field_schema=field_schema, wait=True)
+    schema = service.client.get_collection(collection_name).payload_schema
+    print(f"Collection {collection_name}, payload indexes: {sorted(schema) or 'none'}")
+    if not os.getenv("QDRANT_URL"):
+        print("Warning: embedded Qdrant (VECTOR_DB_PATH) ignores payload indexes; set QDRANT_URL for meaningful numbers")
+
+    if not categories:
+        categories = [value for value, _ in service.get_facets(embedding_type)["grupo"]][:5]
+    embeddings = service._get_embeddings(embedding_type)
+    vectors = {query: embeddings.embed_query(query) for query in queries}
+
+    strategies = {
+        "overfetch-2x": lambda vector, grupo: filtered_search(service, collection_name, vector, grupo, limit, limit * 2, threshold),
+        "exact-limit": lambda vector, grupo: filtered_search(service, collection_name, vector, grupo, limit, limit, threshold, pushdown=True),
+    }
+    print(f"{'strategy':>14} {'p50 ms':>8} {'p99 ms':>8} {f'recall@{limit}':>10} {'avg hits':>9}")
+    for name, strategy in strategies.items():
+        latencies, recalls, hits = [], [], []
+        for query, vector in vectors.items():
+            for grupo in categories:
+                # Ground truth is a brute-force scan over the same filter
+                truth = {hit.id for hit in filtered_search(service, collection_name, vector, int(grupo), limit, limit, threshold, exact=True)}
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    results = strategy(vector, int(grupo))
+                    latencies.append(time.perf_counter() - start)
+                recalls.append(len(truth & {hit.id for hit in results}) / len(truth) if truth else 1.0)
+                hits.append(len(results))
+        print(f"{name:>14} {percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 99) * 1000:>8.2f} "
+              f"{sum(recalls) / len(recalls):>10.3f} {sum(hits) / len(hits):>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare latency and recall of category-filtered search strategies")
+    parser.add_argument("--embedding-type", default="openai", help="collection to benchmark (openai, openai-large, fasttext)")
+    parser.add_argument("--queries", default=None, help="file with one query per line (default: built-in samples)")
+    parser.add_argument("--categories", default=None, help="comma separated grupo values (default: first 5 from the facet index)")
+    parser.add_argument("--limit", type=int, default=5, help="hits requested per query")
+    parser.add_argument("--threshold", type=float, default=0.0, help="minimum score")
+    parser.add_argument("--repeats", type=int, default=20, help="timed runs per query and category")
+    parser.add_argument("--create-indexes", action="store_true",
+                        help="create the grupo/tema payload indexes first (run once without it to measure the 'before')")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        if not os.path.exists(args.queries):
+            print(f"Error: File '{args.queries}' does not exist.")
+            sys.exit(1)
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    categories = [value.strip() for value in args.categories.split(",")] if args.categories else None
+    main(args.embedding_type, queries, categories, args.limit, args.threshold, args.repeats, args.create_indexes)
@@ -0,0 +1,87 @@
+import os
+import time
+import random
+import argparse
+from dotenv import load_dotenv
+from qdrant_client import models
+from app.services.search_service import SearchService
+from app.services.matryoshka import large_collection, truncate_vector, cosine_scores
+from app.services.qdrant_utils import scroll_points
+from app.services.retrieval_metrics import percentile
+
+load_dotenv()
+
+FULL_COLLECTION = large_collection()
+
+
+def build_reduced(client, dimensions, target):
+    # Truncating stored vectors gives the same vectors as re-embedding with `dimensions`, without API calls
+    client.recreate_collection(
+        collection_name=target,
+        vectors_config=models.VectorParams(size=dimensions, distance=models.Distance.COSINE),
+    )
+    batch = []
+    for point in scroll_points(client, FULL_COLLECTION, with_payload=False):
+        batch.append(models.PointStruct(id=point.id, vector=truncate_vector(point.vector, dimensions)))
+        if len(batch) == 256:
+            client.upsert(target, points=batch, wait=True)
+            batch = []
+    if batch:
+        client.upsert(target, points=batch, wait=True)
+
+
+def two_stage(client, collection_name, full_vector, dimensions, limit, rerank, search_params):
+    hits = client.search(collection_name=collection_name, query_vector=truncate_vector(full_vector, dimensions),
+                         limit=max(limit, rerank), search_params=search_params)
+    if not rerank:
+        return [hit.id for hit in hits[:limit]]
+    points = client.retrieve(FULL_COLLECTION, ids=[hit.id for hit in hits], with_payload=False, with_vectors=True)
+    scores = cosine_scores([point.vector for point in points], full_vector)
+    return [points[i].id for i in scores.argsort()[::-1][:limit]]
+
+
+def main(dimensions_list, limit, samples, rerank, hnsw_ef, keep):
+    client = SearchService().client
+    info = client.get_collection(FULL_COLLECTION)
+    points_count, full_dimensions = info.points_count, info.config.params.vectors.size
+    sampled = set(random.Random(0).sample(range(points_count), min(samples, points_count)))
+    # Stored vectors double as queries, so no embedding API calls are needed
+    queries = [point.vector for i, point in enumerate(scroll_points(client, FULL_COLLECTION, with_payload=False)) if i in sampled]
+    truth = [
+        {hit.id for hit in client.search(FULL_COLLECTION, query_vector=vector, limit=limit, search_params=models.SearchParams(exact=True))}
+        for vector in queries
+    ]
+    search_params = models.SearchParams(hnsw_ef=hnsw_ef)
+
+    print(f"{'dims':>6} {'rerank':>7} {'vectors MB':>11} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>8} {f'recall@{limit}':>10}")
+    for dimensions in dimensions_list:
+        target = FULL_COLLECTION if dimensions >= full_dimensions else f"{FULL_COLLECTION}_bench_{dimensions}"
+        if target != FULL_COLLECTION:
+            build_reduced(client, dimensions, target)
+        dimensions = min(dimensions, full_dimensions)
+        for depth in sorted({0, rerank if target != FULL_COLLECTION else 0}):
+            latencies, recalls = [], []
+            for vector, expected in zip(queries, truth):
+                start = time.perf_counter()
+                ids = two_stage(client, target, vector, dimensions, limit, depth, search_params)
+                latencies.append(time.perf_counter() - start)
+                recalls.append(len(expected & set(ids)) / len(expected) if expected else 1.0)
+            vectors_mb = points_count * dimensions * 4 / (1024 * 1024)
+            print(f"{dimensions:>6} {depth or '-':>7} {vectors_mb:>11.2f} {percentile(latencies, 50) * 1000:>8.2f} "
+                  f"{percentile(latencies, 99) * 1000:>8.2f} {len(latencies) / sum(latencies):>8.1f} {sum(recalls) / len(recalls):>10.3f}")
+        if target != FULL_COLLECTION and not keep:
+            client.delete_collection(target)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency and recall of reduced-dimension openai-large search, with and without full-vector reranking")
+    parser.add_argument("--dimensions", default="256,512,1024,3072", help="comma separated output dimensions")
+    parser.add_argument("--limit", type=int, default=10, help="k for recall@k")
+    parser.add_argument("--samples", type=int, default=200, help="stored vectors used as queries")
+    parser.add_argument("--rerank", type=int, default=int(os.getenv("OPENAI_LARGE_RERANK", 50)),
+                        help="short-vector candidates reranked with full vectors")
+    parser.add_argument("--hnsw-ef", type=int, default=int(os.getenv("HNSW_EF", 128)))
+    parser.add_argument("--keep", action="store_true", help="keep the <OPENAI_LARGE_COLLECTION>_bench_<dims> collections")
+    args = parser.parse_args()
+
+    main([int(d) for d in args.dimensions.split(",")], args.limit, args.samples, args.rerank, args.hnsw_ef, args.keep)
@@ -0,0 +1,78 @@
+import os
+import re
+import sys
+import time
+import argparse
+import pandas as pd
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+from app.services import preprocessing
+from app.services.preprocessing import preprocess_many
+
+load_dotenv()
+
+# Inputs where a regex HTML stripper most easily diverges from html.parser
+PARITY_CASES = [
+    "Si el importe es a<b entonces llame al banco",
+    "1 < 2 y 3>2",
+    "texto <!-- comentario sin cerrar y mas texto",
+    "<!-- c --> visible <!-- e",
+    "<![CDATA[hola &amp; <b>x</b>]]> y",
+    '<p title="a>b">dentro</p> fuera',
+    "a<b entonces> sigue",
+    "<p>tarjeta &amp; clave</p><script>var x = 1;</script>fin",
+    "corte <script>sin cierre",
+]
+
+
+def legacy_preprocess(html_content):
+    # The BeautifulSoup implementation preprocessing.py replaced
+    text = BeautifulSoup(html_content, 'html.parser').get_text()
+    text = re.sub(r'[^a-zA-Z0-9\s.,!?]', ' ', text)
+    text = text.lower().strip()
+    return re.sub(r'\s+', ' ', text)
+
+
+def timed(label, rows, func):
+    preprocessing._memo.clear()
+    start = time.perf_counter()
+    results = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22} {len(rows) / elapsed:>12.0f} rows/s {elapsed:>9.2f} s")
+    return results
+
+
+def check_parity():
+    mismatches = [case for case in PARITY_CASES if legacy_preprocess(case) != preprocessing._preprocess(case)]
+    for case in mismatches:
+        print(f"parity mismatch: {case!r}: {legacy_preprocess(case)!r} != {preprocessing._preprocess(case)!r}")
+    print(f"edge cases differing from beautifulsoup: {len(mismatches)} of {len(PARITY_CASES)}")
+
+
+def main(file_path, repeat, workers):
+    check_parity()
+    df = pd.read_excel(file_path)
+    rows = [str(value) for value in df['pregunta'].tolist() + df['respuesta'].tolist()] * repeat
+    print(f"{len(rows)} html fields ({repeat}x the export)")
+    legacy = timed("beautifulsoup", rows, lambda: [legacy_preprocess(row) for row in rows])
+    fast = timed("single-pass", rows, lambda: [preprocessing._preprocess(row) for row in rows])
+    timed("single-pass memoized", rows, lambda: preprocess_many(rows))
+    if workers > 1:
+        preprocessing._PARALLEL_MIN = 0
+        timed(f"single-pass {workers} procs", rows, lambda: preprocess_many(rows, workers=workers))
+    # The new path also drops the _x000d_ escapes, so compare on cleaned input
+    mismatches = sum(1 for row, a, b in zip(rows, legacy, fast) if a != b and legacy_preprocess(re.sub('(?i)_x000d_', ' ', row)) != b)
+    print(f"outputs differing from beautifulsoup: {mismatches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare rows/s of the BeautifulSoup and single-pass HTML preprocessing")
+    parser.add_argument("--file", default=os.getenv("EXCEL_FILE_PATH"), help="Excel export (default: EXCEL_FILE_PATH)")
+    parser.add_argument("--repeat", type=int, default=1, help="process the export this many times (distinct rows only count once when memoized)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if not args.file or not os.path.exists(args.file):
+        print(f"Error: File '{args.file}' does not exist.")
+        sys.exit(1)
+    main(args.file, args.repeat, args.workers)
@@ -0,0 +1,97 @@
+import os
+import time
+import random
+import argparse
+from dotenv import load_dotenv
+from qdrant_client import models
+from app.services.search_service import SearchService
+from app.services.data_ingestion import quantization_config
+from app.services.qdrant_utils import scroll_points
+from app.services.retrieval_metrics import percentile
+
+load_dotenv()
+
+COLLECTIONS = ("articles", "articles_openai", "articles_fasttext")
+# Bytes per dimension held in RAM for candidate search
+BYTES_PER_DIM = {"none": 4, "scalar": 1, "binary": 1 / 8}
+
+
+def copy_collection(client, source, target, kind):
+    # Same vectors and payloads, stored with the requested quantization
+    params = client.get_collection(source).config.params.vectors
+    quantized = quantization_config(kind)
+    client.recreate_collection(
+        collection_name=target,
+        vectors_config=models.VectorParams(size=params.size, distance=params.distance, on_disk=quantized is not None),
+        quantization_config=quantized,
+    )
+    batch = []
+    for point in scroll_points(client, source):
+        batch.append(models.PointStruct(id=point.id, vector=point.vector, payload=point.payload))
+        if len(batch) == 256:
+            client.upsert(target, points=batch, wait=True)
+            batch = []
+    if batch:
+        client.upsert(target, points=batch, wait=True)
+    return params.size
+
+
+def timed_search(client, collection_name, vector, limit, search_params):
+    start = time.perf_counter()
+    hits = client.search(collection_name=collection_name, query_vector=vector, limit=limit, search_params=search_params)
+    return time.perf_counter() - start, [hit.id for hit in hits]
+
+
+def main(collections, kinds, limit, samples, oversampling, hnsw_ef, keep):
+    client = SearchService().client
+    print(f"{'collection':>18} {'mode':>8} {'points':>7} {'RAM MB':>8} {'p50 ms':>8} {'p99 ms':>8} {f'recall@{limit}':>10}")
+    for collection_name in collections:
+        try:
+            points_count = client.get_collection(collection_name).points_count
+        except Exception:
+            print(f"{collection_name:>18} skipped (collection not found)")
+            continue
+        # Stored vectors double as queries, so no embedding API calls are needed
+        sampled = set(random.Random(0).sample(range(points_count), min(samples, points_count)))
+        queries = [point.vector for i, point in enumerate(scroll_points(client, collection_name)) if i in sampled]
+        truth = [
+            set(timed_search(client, collection_name, vector, limit, models.SearchParams(exact=True))[1])
+            for vector in queries
+        ]
+
+        for kind in kinds:
+            target = collection_name if kind == "none" else f"{collection_name}_bench_{kind}"
+            if kind == "none":
+                dim = client.get_collection(collection_name).config.params.vectors.size
+            else:
+                dim = copy_collection(client, collection_name, target, kind)
+            search_params = models.SearchParams(
+                hnsw_ef=hnsw_ef,
+                quantization=models.QuantizationSearchParams(rescore=True, oversampling=oversampling),
+            )
+            latencies, recalls = [], []
+            for vector, expected in zip(queries, truth):
+                elapsed, ids = timed_search(client, target, vector, limit, search_params)
+                latencies.append(elapsed)
+                recalls.append(len(expected & set(ids)) / len(expected) if expected else 1.0)
+            ram_mb = points_count * dim * BYTES_PER_DIM[kind] / 1024 / 1024
+            print(f"{collection_name:>18} {kind:>8} {points_count:>7} {ram_mb:>8.2f} {percentile(latencies, 50) * 1000:>8.2f} "
+                  f"{percentile(latencies, 99) * 1000:>8.2f} {sum(recalls) / len(recalls):>10.3f}")
+            if kind != "none" and not keep:
+                client.delete_collection(target)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare memory, latency and recall of quantized vs unquantized collections")
+    parser.add_argument("--collections", default=",".join(COLLECTIONS), help="comma separated collections to benchmark")
+    parser.add_argument("--modes", default="none,scalar,binary", help="comma separated quantization modes")
+    parser.add_argument("--limit", type=int, default=10, help="k for recall@k")
+    parser.add_argument("--samples", type=int, default=200, help="stored vectors used as queries")
+    parser.add_argument("--oversampling", type=float, default=float(os.getenv("QUANTIZATION_OVERSAMPLING", 2.0)),
+                        help="candidates fetched from the quantized index per requested hit before rescoring")
+    parser.add_argument("--hnsw-ef", type=int, default=int(os.getenv("HNSW_EF", 128)))
+    parser.add_argument("--keep", action="store_true", help="keep the <collection>_bench_<mode> copies")
+    args = parser.parse_args()
+
+    main([c.strip() for c in args.collections.split(",")], [m.strip() for m in args.modes.split(",")],
+         args.limit, args.samples, args.oversampling, args.hnsw_ef, args.keep)
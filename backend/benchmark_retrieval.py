@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import itertools
+import numpy as np
+from dotenv import load_dotenv
+from app.services.search_service import SearchService, HYBRID
+from app.services.embedding_cache import get_embedding_cache
+from app.services.bm25_index import tokenize
+from app.services.retrieval_metrics import recall_at_k, reciprocal_rank, ndcg_at_k, percentile
+
+load_dotenv()
+
+OPENAI_MODELS = {"openai": ("text-embedding-ada-002", 1536), "openai-large": ("text-embedding-3-large", 3072)}
+
+
+class OfflineEmbeddings:
+    # Stands in for OpenAIEmbeddings: vectors already in the embedding cache are reused and any
+    # other text gets a deterministic hashed bag-of-words vector. Nothing is written to the cache.
+    def __init__(self, model, dimension):
+        self.model = model
+        self.dimension = dimension
+        self.cache = get_embedding_cache()
+
+    def _hashed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in tokenize(text):
+            h = zlib.crc32(token.encode("utf-8"))
+            vector[h % self.dimension] += 1.0 if h & 1 << 31 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text):
+        return self.cache.get_many(f"openai:{self.model}", [text])[0] or self._hashed(text)
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def load_labels(path):
+    # JSONL: {"query": ..., "article_ids": [...], "category": optional grupo}
+    labels = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                ids = row.get("article_ids") or [row["article_id"]]
+                labels.append({"query": row["query"], "relevant": {int(i) for i in ids}, "category": row.get("category")})
+    return labels
+
+
+def article_id(hit):
+    return (hit.payload or {}).get("article_id", hit.id)
+
+
+def run_config(service, labels, embedding_type, hnsw_ef, threshold, category_filter, k):
+    os.environ["HNSW_EF"] = str(hnsw_ef)
+    latencies, recalls, rrs, ndcgs = [], [], [], []
+    # Warm-up query so backend loading is not timed
+    service.search(labels[0]["query"], limit=k, embedding_type=embedding_type, threshold=threshold)
+    for label in labels:
+        category = label["category"] if category_filter == "label" else None
+        start = time.perf_counter()
+        hits = service.search(label["query"], category=category, limit=k, embedding_type=embedding_type, threshold=threshold)
+        latencies.append(time.perf_counter() - start)
+        ranked = [article_id(hit) for hit in hits]
+        recalls.append(recall_at_k(ranked, label["relevant"], k))
+        rrs.append(reciprocal_rank(ranked, label["relevant"]))
+        ndcgs.append(ndcg_at_k(ranked, label["relevant"], k))
+    return {
+        "embedding_type": embedding_type,
+        "hnsw_ef": hnsw_ef,
+        "threshold": threshold,
+        "category_filter": category_filter,
+        "queries": len(labels),
+        f"recall@{k}": sum(recalls) / len(recalls),
+        "mrr": sum(rrs) / len(rrs),
+        f"ndcg@{k}": sum(ndcgs) / len(ndcgs),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "qps": len(latencies) / sum(latencies),
+    }
+
+
+def main(labels, embedding_types, hnsw_efs, thresholds, category_filters, k, offline):
+    service = SearchService()
+    # Every query must reach Qdrant, otherwise repeated configs would time the result cache
+    service.result_cache = None
+    if offline:
+        for name, (model, dimension) in OPENAI_MODELS.items():
+            service._backends[name] = OfflineEmbeddings(model, dimension)
+
+    results = []
+    print(f"{'embedding_type':>14} {'ef':>5} {'thr':>5} {'filter':>6} {f'recall@{k}':>9} {'mrr':>6} {f'ndcg@{k}':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'qps':>8}")
+    for embedding_type, hnsw_ef, threshold, category_filter in itertools.product(embedding_types, hnsw_efs, thresholds, category_filters):
+        try:
+            result = run_config(service, labels, embedding_type, hnsw_ef, threshold, category_filter, k)
+        except Exception as e:
+            print(f"{embedding_type:>14} skipped: {e}")
+            continue
+        results.append(result)
+        print(f"{embedding_type:>14} {hnsw_ef:>5} {threshold:>5} {category_filter:>6} {result[f'recall@{k}']:>9.3f} {result['mrr']:>6.3f} "
+              f"{result[f'ndcg@{k}']:>8.3f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['qps']:>8.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline retrieval quality and latency benchmark over labeled queries")
+    parser.add_argument("labels", help="JSONL file of {query, article_ids, category}")
+    parser.add_argument("--embedding-types", default=f"openai,openai-large,fasttext,{HYBRID}")
+    parser.add_argument("--hnsw-ef", default="64,128,256", help="comma separated hnsw_ef values")
+    parser.add_argument("--thresholds", default="0", help="comma separated score thresholds")
+    parser.add_argument("--category-filters", default="none,label",
+                        help="none: no filter; label: filter on each query's labeled category")
+    parser.add_argument("--k", type=int, default=10, help="cutoff for recall and nDCG")
+    parser.add_argument("--offline", action="store_true",
+                        help="replace the OpenAI embeddings with a local stub (cached vectors, else hashed bag-of-words)")
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.labels):
+        print(f"Error: File '{args.labels}' does not exist.")
+        sys.exit(1)
+    labels = load_labels(args.labels)
+    if not labels:
+        print("Error: no labeled queries found.")
+        sys.exit(1)
+    results = main(
+        labels,
+        [t.strip() for t in args.embedding_types.split(",")],
+        [int(ef) for ef in args.hnsw_ef.split(",")],
+        [float(t) for t in args.thresholds.split(",")],
+        [f.strip() for f in args.category_filters.split(",")],
+        args.k,
+        args.offline,
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
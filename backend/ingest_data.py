@@ -1,15 +1,21 @@
 import os
 import sys
+import argparse
 from app.services.data_ingestion import DataIngestionService
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def main(file_path: str):
+def main(file_path: str, batch_size: int = None, workers: int = None, mode: str = None):
     try:
-        data_ingestion_service = DataIngestionService(file_path)
-        data_ingestion_service.ingest_data()
+        data_ingestion_service = DataIngestionService(file_path, batch_size=batch_size, workers=workers, mode=mode)
+        report = data_ingestion_service.ingest_data()
         print("Data ingestion completed successfully.")
+        print(f"Mode: {report['mode']}, upserted: {report['upserted']}, deleted: {report['deleted']} (collection {report['collection']})")
+        print(f"Throughput: {report['rows_per_second']:.1f} rows/s, {report['embeddings_per_second']:.1f} embeddings/s")
+        print(f"Average upsert latency: {report['avg_upsert_seconds'] * 1000:.1f} ms over {report['upserts']} batches")
+        print(f"Chunking: {report['chunking'] or 'off'}, {report['points']} points ({report['chunks_per_article']:.2f} per article), "
+              f"vectors {report['vector_mb']:.1f} MB, payloads {report['payload_mb']:.1f} MB")
         
         # Verify the ingested data
         collection_info = data_ingestion_service.client.get_collection(data_ingestion_service.collection_name)
@@ -20,13 +26,16 @@ def main(file_path: str):
         print(f"An error occurred during data ingestion: {e}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python ingest_data.py <path_to_excel_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Ingest the knowledge-base export into Qdrant")
+    parser.add_argument("file_path", help="path to the Excel export")
+    parser.add_argument("--batch-size", type=int, default=None, help="rows per embedding call and upsert (default: UPSERT_BATCH_SIZE)")
+    parser.add_argument("--workers", type=int, default=None, help="preprocessing processes and concurrent embedding calls (default: INGEST_WORKERS)")
+    parser.add_argument("--mode", choices=["full", "delta", "shadow"], default=None,
+                        help="full: drop and recreate, delta: upsert changed articles only, shadow: rebuild and swap alias (default: INGEST_MODE)")
+    args = parser.parse_args()
     
-    file_path = sys.argv[1]
-    if not os.path.exists(file_path):
-        print(f"Error: File '{file_path}' does not exist.")
+    if not os.path.exists(args.file_path):
+        print(f"Error: File '{args.file_path}' does not exist.")
         sys.exit(1)
     
-    main(file_path)
\ No newline at end of file
+    main(args.file_path, args.batch_size, args.workers, args.mode)
@@ -0,0 +1,84 @@
+import sys
+import json
+import time
+import argparse
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from app.services.retrieval_metrics import percentile
+
+
+def timed_request(request, timeout):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_level(urls, concurrency, requests, timeout, batch_size=1):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda i: timed_request(urls(i), timeout), range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for latency, _ in results]
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, ok in results if not ok),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'requests_per_second': requests / elapsed if elapsed else 0.0,
+        'queries_per_second': requests * batch_size / elapsed if elapsed else 0.0,
+    }
+
+
+def main(base_url, endpoint, query, embedding_type, levels, requests_per_level, timeout, vary=False, batch_size=0):
+    def urls(i):
+        if batch_size:
+            # POST /search/batch with batch_size queries per request
+            queries = [{'query': f"{query} {i} {j}" if vary else query} for j in range(batch_size)]
+            return urllib.request.Request(
+                f"{base_url.rstrip('/')}/search/batch",
+                data=json.dumps({'queries': queries, 'embedding_type': embedding_type}).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+            )
+        # With --vary every request carries a distinct query so the result cache cannot answer it
+        params = urllib.parse.urlencode({'query': f"{query} {i}" if vary else query, 'embedding_type': embedding_type})
+        return f"{base_url.rstrip('/')}/{endpoint.lstrip('/')}?{params}"
+
+    print(f"Load testing {urls(0).full_url if batch_size else urls(0)}" + (f" ({batch_size} queries per request)" if batch_size else ""))
+    print(f"{'concurrency':>12} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'queries/s':>10}")
+    report = []
+    for concurrency in levels:
+        stats = run_level(urls, concurrency, max(requests_per_level, concurrency), timeout, max(batch_size, 1))
+        report.append(stats)
+        print(f"{stats['concurrency']:>12} {stats['requests']:>9} {stats['errors']:>7} "
+              f"{stats['p50_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['requests_per_second']:>8.1f} {stats['queries_per_second']:>10.1f}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure p50/p99 latency of a running API as concurrency rises")
+    parser.add_argument("--url", default="http://localhost:8000", help="base URL of the running API")
+    parser.add_argument("--endpoint", default="/search", help="endpoint to hit (default: /search)")
+    parser.add_argument("--query", default="como cambiar la clave", help="query string to send")
+    parser.add_argument("--embedding-type", default="openai", help="embedding_type parameter")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request in seconds")
+    parser.add_argument("--vary", action="store_true", help="make every query unique to measure uncached latency")
+    parser.add_argument("--batch-size", type=int, default=0, help="send N queries per request to POST /search/batch")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON as well")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    if not levels:
+        print("Error: no concurrency levels given.")
+        sys.exit(1)
+    report = main(args.url, args.endpoint, args.query, args.embedding_type, levels, args.requests, args.timeout, args.vary, args.batch_size)
+    if args.json:
+        print(json.dumps(report, indent=2))
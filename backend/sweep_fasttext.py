@@ -0,0 +1,36 @@
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+from app.services.fasttext_sweep import SWEEP_METRICS, load_search_space, run_sweep
+from app.utils import get_preprocessed_texts
+
+load_dotenv()
+
+
+def main(sweep_path, model_path, workers, metric, k):
+    sweep = load_search_space(sweep_path)
+    results, best = run_sweep(sweep, get_preprocessed_texts(), model_path, workers=workers, metric=metric, k=k)
+    names = sorted(sweep['space'])
+    header = " ".join(f"{name:>10}" for name in names)
+    print(f"{'trial':>5} {header} {f'recall@{k}':>10} {'mrr':>8} {'train s':>9}")
+    for result in results:
+        values = " ".join(f"{str(result['config'][name]):>10}" for name in names)
+        marker = " *" if result['trial'] == best['trial'] else ""
+        print(f"{result['trial']:>5} {values} {result[f'recall_at_{k}']:>10.3f} {result['mrr']:>8.3f} {result['train_seconds']:>9.1f}{marker}")
+    print(f"Promoted trial {best['trial']} to {model_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train FastText configs from a search space in parallel and promote the best by retrieval quality")
+    parser.add_argument("--sweep", default="config/fasttext_sweep.yaml", help="search space YAML")
+    parser.add_argument("--model-path", default=os.getenv("FASTTEXT_MODEL_PATH"), help="where the best model is promoted (default: FASTTEXT_MODEL_PATH)")
+    parser.add_argument("--workers", type=int, default=None, help="parallel trials (default: cores / threads per trial)")
+    parser.add_argument("--metric", choices=SWEEP_METRICS, default="mrr")
+    parser.add_argument("-k", type=int, default=10, help="cutoff for recall@k")
+    args = parser.parse_args()
+
+    if not args.model_path:
+        print("Error: set FASTTEXT_MODEL_PATH or pass --model-path.")
+        sys.exit(1)
+    main(args.sweep, args.model_path, args.workers, args.metric, args.k)
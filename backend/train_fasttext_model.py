@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from app.services.train_fasttext import main as train_fasttext
 from app.utils import get_preprocessed_texts 
+from app.services.source_reader import iter_articles
 
 load_dotenv()
 
@@ -10,4 +11,4 @@ if __name__ == "__main__":
     model_path = os.getenv("FASTTEXT_MODEL_PATH")
     config_path = os.getenv("FASTTEXT_CONFIG_PATH")
     
-    train_fasttext(model_path, get_preprocessed_texts, config_path)
\ No newline at end of file
+    train_fasttext(model_path, get_preprocessed_texts, config_path, iter_articles)
\ No newline at end of file